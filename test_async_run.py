@@ -0,0 +1,102 @@
+import asyncio, inspect, functools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from visualplumes import Middleware
+from test_parallel_run import case_count, case_windows, run_window, merge_outputs
+
+
+# Async versions of Middleware.run for use inside an event loop (e.g. a web service). The model runs in an executor,
+# one case at a time, so the loop stays free and the run can be cancelled between cases (cancelling the awaiting task
+# lets the case in progress finish in the executor, but no further cases are started). executor defaults to a process
+# pool shared by all runs, so concurrent scenarios run on separate cores. A thread pool executor keeps the loop free but
+# gives no CPU parallelism, as the model code holds the GIL.
+#
+# Runs with tidal pollution buildup need all cases in one Middleware.run call, so they report a single progress event
+# when done. With the default executor that call gets its own spawned process, which is terminated if the awaiting
+# task is cancelled; with a given executor it runs to the end. As with test_sweep.WorkerPool, scripts need the
+# if __name__ == "__main__" guard: on every platform for that spawned process, and on Windows and macOS otherwise.
+
+_executor = None
+
+
+def _default_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
+
+
+def _terminate(executor):
+    # the executor's own process map, taken before shutdown clears it; submit adds to it under the same lock shutdown
+    # takes, so after shutdown any process the run started is in it
+    processes = executor._processes
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in list(processes.values()):
+        process.terminate()
+
+
+# single Middleware.run in its own spawned process, terminated if the awaiting task is cancelled. The process is started
+# off the event loop, and spawned rather than forked from this process and its executor threads.
+async def _run_cancellable(run_kwargs):
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    future = None
+    try:
+        future = await loop.run_in_executor(None, executor.submit, functools.partial(Middleware.run, **run_kwargs))
+        return await asyncio.wrap_future(future)
+    finally:
+        if future is not None and future.done():
+            executor.shutdown(wait=False)
+        else:
+            _terminate(executor)
+
+
+def _progress_event(output_dict, case_n, cases):
+    success = bool(output_dict and output_dict['success'])
+    event = {'case': case_n, 'cases': cases, 'success': success, 'casetime': None, 'status': None}
+    if success:
+        event['casetime'] = output_dict['casetime'][-1]
+        outputs = output_dict['plume']['outputs'][-1]
+        event['status'] = outputs[-1]['status'] if len(outputs) else ""
+    else:
+        event['error'] = output_dict['error'] if output_dict else "Unknown error"
+    return event
+
+
+# Yields (progress event, output dict) per case, where the event holds the case number, total cases, case time,
+# final plume status, and success (or error). Runs without timeseries or with tidal pollution buildup are a single step
+# covering all cases.
+async def aiter_run(executor=None, **run_kwargs):
+    loop = asyncio.get_running_loop()
+    timeseries = run_kwargs.get('timeseries_handler')
+    if not timeseries or run_kwargs['model_params'].tidal_pollution_buildup:
+        if executor is None:
+            output_dict = await _run_cancellable(run_kwargs)
+        else:
+            output_dict = await loop.run_in_executor(executor, functools.partial(Middleware.run, **run_kwargs))
+        cases = output_dict['cases'] if output_dict and output_dict['success'] else 1
+        yield _progress_event(output_dict, cases, cases), output_dict
+        return
+    if executor is None:
+        executor = _default_executor()
+    cases = case_count(timeseries)
+    for case_i, window in enumerate(case_windows(timeseries, cases)):
+        output_dict = await loop.run_in_executor(executor, run_window, run_kwargs, window)
+        event = _progress_event(output_dict, case_i + 1, cases)
+        yield event, output_dict
+        if not event['success']:
+            return
+
+
+# Same arguments as Middleware.run, plus an executor and an optional progress callback (plain or async) called with
+# each case's progress event. Returns the output dict for all cases, or that of the first failed case.
+async def arun(executor=None, progress=None, **run_kwargs):
+    output_dicts = []
+    async for event, output_dict in aiter_run(executor, **run_kwargs):
+        if progress:
+            result = progress(event)
+            if inspect.isawaitable(result):
+                await result
+        if not event['success']:
+            return output_dict
+        output_dicts.append(output_dict)
+    return merge_outputs(output_dicts) if len(output_dicts) > 1 else output_dicts[0]
@@ -0,0 +1,138 @@
+import os, sys, io, time, json, pickle, runpy, argparse, platform, contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SEJPA_SCENARIOS = sorted(fn for fn in os.listdir(REPO_DIR) if fn.startswith("SEJPA_") and fn.endswith(".py"))
+SCENARIOS = ["tutorial-single-port.py"] + SEJPA_SCENARIOS + ["example-timeseries.py", "TRwtp.py"]
+
+
+# UM3 steps taken over all cases (the last output row of each case is the final step)
+def count_steps(output_dict):
+    if not output_dict or not output_dict.get('success'):
+        return 0
+    return sum(outputs[-1]['step'] for outputs in output_dict['plume']['outputs'] if len(outputs))
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0*1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+class _CountingWriter(io.TextIOBase):
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text.encode("utf-8"))
+        return len(text)
+
+
+def _bench_script(script):
+    os.environ["MPLBACKEND"] = "Agg"
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+    from visualplumes import Middleware
+
+    # time the model runs separately from the scenario setup and printing of outputs
+    runs = []
+    original_run = Middleware.run
+    def timed_run(*args, **kwargs):
+        start = time.perf_counter()
+        output_dict = original_run(*args, **kwargs)
+        run_time = time.perf_counter() - start
+        runs.append({
+            'run_time':     run_time,
+            'cases':        output_dict['cases'] if output_dict and output_dict.get('success') else 0,
+            'steps':        count_steps(output_dict),
+            'output_bytes': len(pickle.dumps(output_dict, protocol=pickle.HIGHEST_PROTOCOL)),
+        })
+        return output_dict
+    Middleware.run = timed_run
+    stdout = _CountingWriter()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            runpy.run_path(os.path.join(REPO_DIR, script), run_name="__main__")
+    finally:
+        Middleware.run = original_run
+    return {
+        'wall_time':    time.perf_counter() - start,
+        'run_time':     sum(run['run_time'] for run in runs),
+        'runs':         len(runs),
+        'cases':        sum(run['cases'] for run in runs),
+        'steps':        sum(run['steps'] for run in runs),
+        'output_bytes': sum(run['output_bytes'] for run in runs),
+        'stdout_bytes': stdout.size,
+        'peak_rss_mb':  _peak_rss_mb(),
+    }
+
+
+# each run of a scenario script is made in a fresh process, one at a time so timings don't compete for cores
+def bench_script(script, repeat=1):
+    results = []
+    for i in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results.append(executor.submit(_bench_script, script).result())
+    best = min(results, key=lambda result: result['run_time'])
+    best['steps_per_sec'] = best['steps'] / best['run_time'] if best['run_time'] > 0 else 0.0
+    best['repeat'] = repeat
+    return best
+
+
+def bench_scenarios(scripts=None, repeat=1):
+    import visualplumes
+    return {
+        'created':     datetime.now().isoformat(timespec="seconds"),
+        'python':      platform.python_version(),
+        'platform':    platform.platform(),
+        'visualplumes': getattr(visualplumes, "__version__", None),
+        'scenarios':   {script: bench_script(script, repeat) for script in (scripts or SCENARIOS)},
+    }
+
+
+def print_results(results, baseline=None):
+    print(f"{'Scenario':<48} {'Run (s)':>9} {'Wall (s)':>9} {'Cases':>6} {'Steps':>8} {'Steps/s':>10} "
+          f"{'RSS (MB)':>9} {'Output (kB)':>12}" + (f" {'vs. base':>9}" if baseline else ""))
+    for script, result in results['scenarios'].items():
+        rss = f"{result['peak_rss_mb']:9.1f}" if result['peak_rss_mb'] is not None else f"{'-':>9}"
+        line = (f"{script:<48} {result['run_time']:9.3f} {result['wall_time']:9.3f} {result['cases']:6d} "
+                f"{result['steps']:8d} {result['steps_per_sec']:10.1f} {rss} {result['output_bytes']/1024.0:12.1f}")
+        if baseline:
+            base = baseline['scenarios'].get(script)
+            if base and result['run_time'] > 0:
+                line += f" {base['run_time']/result['run_time']:8.2f}x"
+            else:
+                line += f" {'-':>9}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scenario scripts headless, one fresh process per run.")
+    parser.add_argument("scripts", nargs="*", help="scenario scripts (default: all scenarios)")
+    parser.add_argument("--sejpa", action="store_true", help="only the SEJPA scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, best run is kept (default: 3)")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of earlier results to show speedup against")
+    args = parser.parse_args()
+
+    scripts = args.scripts or (SEJPA_SCENARIOS if args.sejpa else SCENARIOS)
+    results = bench_scenarios(scripts, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fjson:
+            baseline = json.load(fjson)
+    print_results(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as fjson:
+            json.dump(results, fjson, indent=2)
@@ -0,0 +1,129 @@
+import os, enum, types, zlib, pickle, hashlib, functools, tempfile
+import numpy as np
+import visualplumes
+from visualplumes import Middleware
+
+
+CACHE_DIR       = "./.run_cache"
+CACHE_MAX_BYTES = 512*1024*1024
+# bump to invalidate cached results when the hashing or stored format changes
+CACHE_VERSION   = 3
+
+
+def _update_hash(hasher, value, seen):
+    if value is None or isinstance(value, (bool, int, float, complex)):
+        hasher.update(repr(value).encode())
+    elif isinstance(value, str):
+        hasher.update(repr(value).encode())
+        # timeseries files are referenced by path, so their contents are part of the scenario
+        if os.path.isfile(value):
+            with open(value, 'rb') as fdata:
+                hasher.update(hashlib.sha256(fdata.read()).digest())
+    elif isinstance(value, enum.Enum):
+        hasher.update(f"{type(value).__qualname__}.{value.name}".encode())
+    elif isinstance(value, type):
+        hasher.update(f"<{value.__module__}.{value.__qualname__}>".encode())
+    elif isinstance(value, np.generic):
+        hasher.update(f"<{value.dtype.str}>{value.item()!r}".encode())
+    elif isinstance(value, (types.FunctionType, types.BuiltinFunctionType, types.MethodType)):
+        # functions hash by name, so lambdas and nested functions, which share names, can't be told apart
+        if "<" in value.__qualname__:
+            raise TypeError(f"Can't hash {value.__qualname__} in a scenario, use a top-level function")
+        hasher.update(f"<{value.__module__}.{value.__qualname__}>".encode())
+        bound = getattr(value, '__self__', None)
+        if bound is not None and not isinstance(bound, types.ModuleType):
+            _update_hash(hasher, bound, seen)
+    elif id(value) in seen:
+        # shared or cyclic references hash as the position the object was first seen at
+        hasher.update(f"<ref {seen[id(value)]}>".encode())
+    elif isinstance(value, np.ndarray):
+        seen[id(value)] = len(seen)
+        hasher.update(f"<ndarray {value.dtype.str} {value.shape}>".encode())
+        if value.dtype.hasobject:
+            _update_hash(hasher, value.tolist(), seen)
+        else:
+            hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        seen[id(value)] = len(seen)
+        hasher.update(b"{")
+        for key in sorted(value, key=repr):
+            _update_hash(hasher, key, seen)
+            _update_hash(hasher, value[key], seen)
+        hasher.update(b"}")
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        seen[id(value)] = len(seen)
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        hasher.update(f"{type(value).__name__}[".encode())
+        for item in items:
+            _update_hash(hasher, item, seen)
+        hasher.update(b"]")
+    elif isinstance(value, functools.partial):
+        seen[id(value)] = len(seen)
+        hasher.update(b"<partial>")
+        _update_hash(hasher, (value.func, value.args, value.keywords), seen)
+    elif hasattr(value, '__dict__'):
+        seen[id(value)] = len(seen)
+        hasher.update(f"<{type(value).__module__}.{type(value).__qualname__}>".encode())
+        _update_hash(hasher, vars(value), seen)
+    else:
+        # a repr may hold a memory address, which would change the hash on every run
+        raise TypeError(f"Can't hash {type(value).__qualname__} values in a scenario")
+
+
+# content hash of Middleware.run arguments: all parameter/store/handler attributes, the ambient stack, and the
+# contents of any files they reference (timeseries CSVs). Raises TypeError for values it can't hash reliably.
+def scenario_hash(run_kwargs):
+    hasher = hashlib.sha256()
+    hasher.update(f"v{CACHE_VERSION};visualplumes {getattr(visualplumes, '__version__', '')};".encode())
+    _update_hash(hasher, run_kwargs, {})
+    return hasher.hexdigest()
+
+
+def _evict(cache_dir, max_bytes):
+    entries = []
+    for fn in os.listdir(cache_dir):
+        if fn.endswith(".pkl.z"):
+            try:
+                stat = os.stat(os.path.join(cache_dir, fn))
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, fn))
+    total = sum(entry[1] for entry in entries)
+    # least recently used first (hits touch the file's modified time)
+    for mtime, size, fn in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, fn))
+        except FileNotFoundError:
+            pass  # evicted by another process
+        total -= size
+
+
+# Same arguments as Middleware.run. Successful results are stored compressed in cache_dir under the scenario hash and
+# loaded from there when the same scenario is run again. The cache is trimmed to max_bytes, least recently used first.
+def cached_run(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, **run_kwargs):
+    key = scenario_hash(run_kwargs)
+    fp_cache = os.path.join(cache_dir, f"{key}.pkl.z")
+    if os.path.exists(fp_cache):
+        try:
+            with open(fp_cache, 'rb') as fcache:
+                output_dict = pickle.loads(zlib.decompress(fcache.read()))
+            os.utime(fp_cache)
+            return output_dict
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+            pass  # unreadable entry, rerun and overwrite it
+
+    output_dict = Middleware.run(**run_kwargs)
+    if not output_dict or not output_dict['success']:
+        return output_dict
+
+    os.makedirs(cache_dir, exist_ok=True)
+    data = zlib.compress(pickle.dumps(output_dict, protocol=pickle.HIGHEST_PROTOCOL))
+    # write to a temporary file first so other processes never read a partial entry
+    fd, fp_temp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as ftemp:
+        ftemp.write(data)
+    os.replace(fp_temp, fp_cache)
+    _evict(cache_dir, max_bytes)
+    return output_dict
@@ -0,0 +1,256 @@
+import os, re, sys, bisect, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Compares plume output tables between two text outputs, either from print_outputs (e.g. TRwtp.outputs.python.txt) or
+# legacy Plumes20 text (e.g. TRwtp.outputs.plumes20.txt, or the tables pasted in the SEJPA scripts' docstrings).
+# Tables are split by case, columns matched by label (see LABEL_ALIASES), rows aligned by step, and values checked
+# against per-variable tolerances (|test - ref| <= atol + rtol*|ref| + the rounding of both printed values), given as
+# {name: (rtol, atol)} where the None key overrides DEFAULT_TOLERANCE for all other variables.
+
+CASE_PYTHON   = re.compile(r"^Case (\d+) \(\+")
+CASE_PLUMES20 = re.compile(r"^Case (\d+);")
+STEP_HEADER   = re.compile(r"^\s*Step\b")
+STEP_ROW      = re.compile(r"^\s*(\d+)\s+[-+\d.,]")
+
+# output labels (lowercase) used by the scenario scripts and Plumes20, by common variable name
+LABEL_ALIASES = {
+    'depth':          ('depth',),
+    'diameter':       ('p-dia', 'width', 'diameter'),
+    'vertical_angle': ('v-angle', 'ver angl', 'vertical angle'),
+    'salinity':       ('eff-sal', 'salinity'),
+    'temperature':    ('temp', 'temp.', 'temperature'),
+    'concentration':  ('polutnt', 'pollutant'),
+    'density':        ('density',),
+    'amb_density':    ('amb-den',),
+    'amb_current':    ('amb-cur',),
+    'speed':          ('p-speed', 'velocity'),
+    'dilution':       ('dilutn', 'dilution'),
+    'x_displacement': ('x-posn', 'x-pos', 'x-position'),
+    'y_displacement': ('y-posn', 'y-pos', 'y-position'),
+    'iso_diameter':   ('iso dia', 'iso diameter'),
+}
+LABEL_NAMES = {alias: name for name, aliases in LABEL_ALIASES.items() for alias in aliases}
+
+# default (rtol, atol), loose enough for the rounding of printed values
+DEFAULT_TOLERANCE = (0.01, 0.001)
+
+
+def variable_name(label):
+    return LABEL_NAMES.get(label.lower(), label.lower())
+
+
+def _units(units_text):
+    return units_text.strip().strip("()").replace("°", "").lower()
+
+
+def _float(text):
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return float('nan')
+
+
+# half a unit in the last printed digit, e.g. 0.0005 for "2.118" or 5e-9 for "1.000E-5"
+def _resolution(text):
+    mantissa, _, exponent = text.replace(",", "").lower().partition("e")
+    decimals = len(mantissa.partition(".")[2])
+    try:
+        return 0.5 * 10.0**(int(exponent or 0) - decimals)
+    except ValueError:
+        return 0.0
+
+
+# splits a header line into one text per column, assigning each word to the column whose span it starts in (labels
+# longer than their column overflow to the right)
+def _header_columns(line, ends):
+    columns = [[] for end in ends]
+    for match in re.finditer(r"\S+", line):
+        columns[min(bisect.bisect_right(ends, match.start()), len(ends) - 1)].append(match.group())
+    return [" ".join(words) for words in columns]
+
+
+def _parse_table(label_line, units_line, rows):
+    first = rows[0].split(";")[0]
+    ends = [match.end() for match in re.finditer(r"\S+", first)]
+    names = ['step'] + [variable_name(label) for label in _header_columns(label_line, ends)[1:]]
+    units = [''] + [_units(units_text) for units_text in _header_columns(units_line, ends)[1:]]
+    table = {'names': names, 'units': units, 'steps': [], 'values': [], 'resolutions': [], 'statuses': [],
+             'unparsed': 0}
+    for row in rows:
+        numbers, _, status = row.partition(";")
+        tokens = numbers.split()
+        if len(tokens) != len(names):
+            table['unparsed'] += 1
+            continue
+        table['steps'].append(int(tokens[0]))
+        table['values'].append([_float(token) for token in tokens[1:]])
+        table['resolutions'].append([_resolution(token) for token in tokens[1:]])
+        table['statuses'].append(status.strip().strip(";").strip())
+    return table
+
+
+# plume tables by case number from print_outputs or Plumes20 text (text without case headers is case 1)
+def parse_outputs(text):
+    lines = text.splitlines()
+    python_format = any(CASE_PYTHON.match(line) for line in lines)
+    case_re = CASE_PYTHON if python_format else CASE_PLUMES20
+    tables = {}
+    case_n = 1
+    i = 0
+    while i < len(lines):
+        match = case_re.match(lines[i])
+        if match:
+            case_n = int(match.group(1))
+            i += 1
+            continue
+        if not STEP_HEADER.match(lines[i]) or i + 1 >= len(lines):
+            i += 1
+            continue
+        # print_outputs puts the labels on the Step line, Plumes20 puts them on the line above
+        if python_format:
+            label_line, units_line = lines[i], lines[i+1]
+            i += 2
+        else:
+            label_line, units_line = lines[i-1], lines[i]
+            i += 1
+        rows = []
+        while i < len(lines):
+            if STEP_ROW.match(lines[i]):
+                rows.append(lines[i])
+            elif not lines[i].lstrip().startswith("Step "):  # skip Plumes20 messages (e.g. isopleth closed)
+                break
+            i += 1
+        if rows and case_n not in tables:
+            tables[case_n] = _parse_table(label_line, units_line, rows)
+    return tables
+
+
+def parse_file(filepath):
+    with open(filepath, encoding="utf-8", errors="replace") as ftxt:
+        return parse_outputs(ftxt.read())
+
+
+def compare_case(case_n, test, ref, tolerances=None):
+    tolerances = tolerances or {}
+    test_rows = {}
+    for row_i, step in enumerate(test['steps']):
+        test_rows.setdefault(step, row_i)
+    ref_rows = {}
+    for row_i, step in enumerate(ref['steps']):
+        ref_rows.setdefault(step, row_i)
+    steps = sorted(set(test_rows) & set(ref_rows))
+    result = {
+        'case':          case_n,
+        'steps':         len(steps),
+        'missing_steps': sorted(set(ref_rows) - set(test_rows)),
+        'extra_steps':   sorted(set(test_rows) - set(ref_rows)),
+        'variables':     {},
+    }
+    for test_col, name in enumerate(test['names'][1:]):
+        if name not in ref['names'][1:]:
+            continue
+        ref_col = ref['names'].index(name) - 1
+        units = (test['units'][test_col+1], ref['units'][ref_col+1])
+        stats = {'units': units, 'points': 0, 'fails': 0, 'max_abs': 0.0, 'max_rel': 0.0, 'worst': None}
+        result['variables'][name] = stats
+        if units[0] != units[1]:
+            continue
+        rtol, atol = tolerances.get(name, tolerances.get(None, DEFAULT_TOLERANCE))
+        for step in steps:
+            test_val = test['values'][test_rows[step]][test_col]
+            ref_val  = ref['values'][ref_rows[step]][ref_col]
+            if test_val != test_val or ref_val != ref_val:  # nan
+                continue
+            diff = abs(test_val - ref_val)
+            rounding = test['resolutions'][test_rows[step]][test_col] + ref['resolutions'][ref_rows[step]][ref_col]
+            stats['points'] += 1
+            if diff > atol + rtol*abs(ref_val) + rounding:
+                stats['fails'] += 1
+            if diff > stats['max_abs']:
+                stats['max_abs'] = diff
+                stats['worst'] = (case_n, step)
+            if ref_val != 0:
+                stats['max_rel'] = max(stats['max_rel'], diff/abs(ref_val))
+    return result
+
+
+def _compare_case_args(args):
+    return compare_case(*args)
+
+
+# compares all cases found in both outputs, in parallel across worker processes (workers=1 runs in this process)
+def compare_outputs(test_tables, ref_tables, tolerances=None, workers=None):
+    cases = sorted(set(test_tables) & set(ref_tables))
+    jobs = [(case_n, test_tables[case_n], ref_tables[case_n], tolerances) for case_n in cases]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or len(jobs) < 2:
+        case_results = [compare_case(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            case_results = list(executor.map(_compare_case_args, jobs, chunksize=max(1, len(jobs)//(4*workers))))
+
+    summary = {
+        'cases':         len(cases),
+        'missing_cases': sorted(set(ref_tables) - set(test_tables)),
+        'extra_cases':   sorted(set(test_tables) - set(ref_tables)),
+        'steps':         sum(result['steps'] for result in case_results),
+        'missing_steps': sum(len(result['missing_steps']) for result in case_results),
+        'extra_steps':   sum(len(result['extra_steps']) for result in case_results),
+        'variables':     {},
+        'fails':         0,
+    }
+    for result in case_results:
+        for name, stats in result['variables'].items():
+            total = summary['variables'].setdefault(name, {
+                'units': stats['units'], 'points': 0, 'fails': 0, 'max_abs': 0.0, 'max_rel': 0.0, 'worst': None
+            })
+            total['points'] += stats['points']
+            total['fails']  += stats['fails']
+            total['max_rel'] = max(total['max_rel'], stats['max_rel'])
+            if stats['worst'] and stats['max_abs'] > total['max_abs']:
+                total['max_abs'] = stats['max_abs']
+                total['worst']   = stats['worst']
+    summary['fails'] = sum(stats['fails'] for stats in summary['variables'].values())
+    return summary
+
+
+def print_summary(summary):
+    print(f"Cases compared: {summary['cases']} (missing: {len(summary['missing_cases'])}, "
+          f"extra: {len(summary['extra_cases'])})")
+    print(f"Steps aligned:  {summary['steps']} (missing: {summary['missing_steps']}, extra: {summary['extra_steps']})")
+    print("")
+    print(f"{'Variable':<16} {'Units':>18} {'Points':>7} {'Fails':>6} {'Max abs':>11} {'Max rel':>9}  Worst (case, step)")
+    for name, stats in summary['variables'].items():
+        units = stats['units'][0] if stats['units'][0] == stats['units'][1] else "/".join(stats['units']) + " (!)"
+        worst = f"{stats['worst'][0]}, {stats['worst'][1]}" if stats['worst'] else ""
+        print(f"{name:<16} {units:>18} {stats['points']:7d} {stats['fails']:6d} {stats['max_abs']:11.4g} "
+              f"{stats['max_rel']:9.2%}  {worst}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare plume output tables of two text outputs.")
+    parser.add_argument("test", help="output to check, e.g. TRwtp.outputs.python.txt")
+    parser.add_argument("reference", help="reference output, e.g. TRwtp.outputs.plumes20.txt")
+    parser.add_argument("--rtol", type=float, default=DEFAULT_TOLERANCE[0], help="default relative tolerance")
+    parser.add_argument("--atol", type=float, default=DEFAULT_TOLERANCE[1], help="default absolute tolerance")
+    parser.add_argument("--tol", action="append", default=[], metavar="NAME=RTOL,ATOL",
+                        help="tolerance for one variable, e.g. dilution=0.02,0.01")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--allow-step-mismatch", action="store_true",
+                        help="don't fail on steps printed by only one output (e.g. python vs Plumes20)")
+    args = parser.parse_args()
+
+    tolerances = {None: (args.rtol, args.atol)}
+    for tol in args.tol:
+        name, _, values = tol.partition("=")
+        rtol, atol = values.split(",")
+        tolerances[name] = (float(rtol), float(atol))
+
+    summary = compare_outputs(parse_file(args.test), parse_file(args.reference), tolerances, args.workers)
+    print_summary(summary)
+    failed = summary['fails'] or summary['missing_cases'] or summary['extra_cases']
+    if not args.allow_step_mismatch:
+        failed = failed or summary['missing_steps'] or summary['extra_steps']
+    sys.exit(1 if failed else 0)
@@ -1,122 +1,157 @@
 import os, math, csv
 
 
-def csv_outputs(output_dict, folderpath, filename_format):
-    case_digits = int(math.log10(output_dict['cases']))
+# format of case numbers in file names, zero-padded to at least two digits
+def case_number_format(cases):
+    case_digits = int(math.log10(cases)) if cases > 0 else 0
     if case_digits < 2:
         case_digits = 2
-    case_format = "{0:0" + str(case_digits) + "d}"
-    if filename_format.lower().endswith(".csv"):
-        filename_format = filename_format[:-4]
+    return "{0:0" + str(case_digits) + "d}"
 
-    if not os.path.exists(folderpath):
-        os.makedirs(folderpath)
 
+def _header_vals(headers, first=None):
+    header_vals = [first] if first else []
+    for i, hdr in enumerate(headers):
+        header_text = hdr['label']
+        if hdr['units_label'] != "":
+            header_text += f" ({hdr['units_label']})"
+        header_vals.append(header_text)
+    return header_vals
+
+
+# model parameter memos of a run made of several, with the timeseries start/end time spanning the first to the last
+def spanned_memos(first_memos, last_memos):
+    memos = list(first_memos)
+    for i, memo in enumerate(memos):
+        if memo.startswith("Start/end time:") and i < len(last_memos) and " / " in memo:
+            memos[i] = memo.split(" / ")[0] + " / " + last_memos[i].split(" / ")[-1]
+    return memos
+
+
+def _write_params(memos, folderpath, filename_format):
     # print general params
     fp_memos = os.path.join(folderpath, f"{filename_format}.params.txt")
     with open(fp_memos, 'w') as fmemo:
         # print model param memos
-        memos = output_dict['modelparams']['memos']
         if len(memos):
             fmemo.write("\n".join(memos) + "\n")
 
-    diff_outs = output_dict['diffuser']
+
+# writes the ambient, memos, plume, and far-field files of case_i in output_dict, numbered as case_n
+def _write_case(output_dict, case_i, case_n, folderpath, filename_format, case_format):
     amb_outs  = output_dict['ambient']
     um_outs   = output_dict['plume']
     ff_outs   = output_dict['farfield']
-    tpb_outs  = output_dict['tpb']
+    case_fn   = case_format.format(case_n)
 
-    # prep headers for diffuser outputs
-    diff_header_vals = ["Case"]
-    for i, hdr in enumerate(diff_outs['headers']):
-        header_text = hdr['label']
-        if hdr['units_label'] != "":
-            header_text += f" ({hdr['units_label']})"
-        diff_header_vals.append(header_text)
-    # prep headers for ambient outputs
-    amb_header_vals = []
-    for i, hdr in enumerate(amb_outs['headers']):
-        header_text = hdr['label']
-        if hdr['units_label'] != "":
-            header_text += f" ({hdr['units_label']})"
-        amb_header_vals.append(header_text)
-    # prep headers for plume outputs
-    header_vals = ["Step"]
-    for i, hdr in enumerate(um_outs['headers']):
-        header_text = hdr['label']
-        if hdr['units_label'] != "":
-            header_text += f" ({hdr['units_label']})"
-        header_vals.append(header_text)
-    # prep headers for brooks ff outputs
-    ff_header_vals = []
-    if ff_outs['was_run'] and len(ff_outs['headers']):
-        for i, hdr in enumerate(ff_outs['headers']):
-            header_text = hdr['label']
-            if hdr['units_label'] != "":
-                header_text += f" ({hdr['units_label']})"
-            ff_header_vals.append(header_text)
+    # ambient csv
+    fp_amb = os.path.join(folderpath, f"{filename_format}.{case_fn}.ambient.csv")
+    with open(fp_amb, 'w', newline='') as fcsv:
+        writer = csv.writer(fcsv)
+        writer.writerow(_header_vals(amb_outs['headers']))
+        writer.writerows(amb_outs['outputs'][case_i])
+
+    # print memos
+    fp_memos = os.path.join(folderpath, f"{filename_format}.{case_fn}.memos.txt")
+    with open(fp_memos, 'w') as fmemo:
+        fmemo.write("---------------------------------------------------\n")
+        fmemo.write(f"Case {case_n} (+{output_dict['casetime'][case_i]/3600.0:.2f} hrs):\n")
+        fmemo.write("---------------------------------------------------\n")
+        # print timeseries indices
+        if output_dict['timeseries']:
+            for memo in output_dict['timeseries']['memos'][case_i]:
+                fmemo.write(memo+"\n")
+        # print model memos
+        memos = um_outs['memos'][case_i]
+        if len(memos):
+            fmemo.write("\n" + "\n".join(memos) + "\n")
+        # print post model memos
+        memos = um_outs['postmemos'][case_i]
+        if len(memos):
+            fmemo.write("\n" + "\n".join(memos) + "\n")
+        # print ff memos
+        if ff_outs['was_run']:
+            fmemo.write("\n" + "\n".join(ff_outs['memos'][case_i]) + "\n")
+
+    # plume csv
+    fp_plume = os.path.join(folderpath, f"{filename_format}.{case_fn}.plume.csv")
+    with open(fp_plume, 'w', newline='') as fcsv:
+        writer = csv.writer(fcsv)
+        writer.writerow(_header_vals(um_outs['headers'], "Step"))
+        for output in um_outs['outputs'][case_i]:
+            writer.writerow([output['step']] + output['values'] + [output['status']])
+
+    # brooks ff csv
+    if ff_outs['was_run']:
+        ff_header_vals = _header_vals(ff_outs['headers']) if len(ff_outs['headers']) else []
+        fp_bff = os.path.join(folderpath, f"{filename_format}.{case_fn}.farfield.csv")
+        with open(fp_bff, 'w', newline='') as fcsv:
+            writer = csv.writer(fcsv)
+            writer.writerow(ff_header_vals)
+            for output in ff_outs['outputs'][case_i]:
+                writer.writerow(output['values'])
+
+
+def csv_outputs(output_dict, folderpath, filename_format):
+    case_format = case_number_format(output_dict['cases'])
+    if filename_format.lower().endswith(".csv"):
+        filename_format = filename_format[:-4]
+
+    if not os.path.exists(folderpath):
+        os.makedirs(folderpath)
+
+    _write_params(output_dict['modelparams']['memos'], folderpath, filename_format)
 
     # diffuser csv
+    diff_outs = output_dict['diffuser']
     fp_diff = os.path.join(folderpath, f"{filename_format}.diffuser.csv")
     with open(fp_diff, 'w', newline='') as fcsv:
         writer = csv.writer(fcsv)
-        writer.writerow(diff_header_vals)
+        writer.writerow(_header_vals(diff_outs['headers'], "Case"))
         for case_i, outputs in enumerate(diff_outs['outputs']):
             writer.writerow([case_i+1] + list(outputs))
 
     # loop by case
     for case_i in range(output_dict['cases']):
-        case_n  = case_i+1
-        case_fn = case_format.format(case_n)
-
-        # ambient csv
-        fp_amb = os.path.join(folderpath, f"{filename_format}.{case_fn}.ambient.csv")
-        with open(fp_amb, 'w', newline='') as fcsv:
-            writer = csv.writer(fcsv)
-            writer.writerow(amb_header_vals)
-            writer.writerows(amb_outs['outputs'][case_i])
-
-        # print memos
-        fp_memos = os.path.join(folderpath, f"{filename_format}.{case_fn}.memos.txt")
-        with open(fp_memos, 'w') as fmemo:
-            fmemo.write("---------------------------------------------------\n")
-            fmemo.write(f"Case {case_n} (+{output_dict['casetime'][case_i]/3600.0:.2f} hrs):\n")
-            fmemo.write("---------------------------------------------------\n")
-            # print timeseries indices
-            if output_dict['timeseries']:
-                for memo in output_dict['timeseries']['memos'][case_i]:
-                    fmemo.write(memo+"\n")
-            # print model memos
-            memos = um_outs['memos'][case_i]
-            if len(memos):
-                fmemo.write("\n" + "\n".join(memos) + "\n")
-            # print post model memos
-            memos = um_outs['postmemos'][case_i]
-            if len(memos):
-                fmemo.write("\n" + "\n".join(memos) + "\n")
-            # print ff memos
-            if ff_outs['was_run']:
-                fmemo.write("\n" + "\n".join(ff_outs['memos'][case_i]) + "\n")
-
-        # plume csv
-        fp_plume = os.path.join(folderpath, f"{filename_format}.{case_fn}.plume.csv")
-        with open(fp_plume, 'w', newline='') as fcsv:
-            writer = csv.writer(fcsv)
-            writer.writerow(header_vals)
-            for output in um_outs['outputs'][case_i]:
-                writer.writerow([output['step']] + output['values'] + [output['status']])
-
-        # brooks ff csv
-        if ff_outs['was_run']:
-            fp_bff = os.path.join(folderpath, f"{filename_format}.{case_fn}.farfield.csv")
-            with open(fp_bff, 'w', newline='') as fcsv:
-                writer = csv.writer(fcsv)
-                writer.writerow(ff_header_vals)
-                for output in ff_outs['outputs'][case_i]:
-                    writer.writerow(output['values'])
+        _write_case(output_dict, case_i, case_i+1, folderpath, filename_format, case_format)
 
     # tidal pollution buildup outputs
+    tpb_outs = output_dict['tpb']
     if tpb_outs['was_run']:
         fp_tpb = os.path.join(folderpath, f"{filename_format}.tpb.txt")
         with open(fp_tpb, 'w', newline='') as ftxt:
             ftxt.write("\n".join(tpb_outs['memos']))
+
+
+# Same files as csv_outputs, but from an iterable of single-case output dicts (e.g. test_stream_run.iter_run), so each
+# case is written as it arrives and can be freed. cases is the total expected, used only for file numbering.
+# Stops at and returns the output dict of a failed run, otherwise returns None.
+def csv_stream_outputs(output_iter, folderpath, filename_format, cases):
+    case_format = case_number_format(cases)
+    if filename_format.lower().endswith(".csv"):
+        filename_format = filename_format[:-4]
+
+    if not os.path.exists(folderpath):
+        os.makedirs(folderpath)
+
+    fp_diff = os.path.join(folderpath, f"{filename_format}.diffuser.csv")
+    with open(fp_diff, 'w', newline='') as fdiff:
+        diff_writer = csv.writer(fdiff)
+        case_n = 0
+        first_memos = last_memos = None
+        for output_dict in output_iter:
+            if not output_dict or not output_dict['success']:
+                return output_dict
+            last_memos = output_dict['modelparams']['memos']
+            if case_n == 0:
+                first_memos = last_memos
+                diff_writer.writerow(_header_vals(output_dict['diffuser']['headers'], "Case"))
+            for case_i in range(output_dict['cases']):
+                case_n += 1
+                diff_writer.writerow([case_n] + list(output_dict['diffuser']['outputs'][case_i]))
+                _write_case(output_dict, case_i, case_n, folderpath, filename_format, case_format)
+            fdiff.flush()
+    # the params file is written last so its start/end time covers every case
+    if first_memos is not None:
+        _write_params(spanned_memos(first_memos, last_memos), folderpath, filename_format)
+    return None
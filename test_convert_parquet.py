@@ -0,0 +1,96 @@
+import os
+import numpy as np
+from test_output_columns import plume_tables, farfield_table, ambient_table, diffuser_table
+
+
+def _column_name(hdr):
+    if hdr['units_label'] != "":
+        return f"{hdr['label']} ({hdr['units_label']})"
+    return hdr['label']
+
+
+def _concat_cases(tables):
+    case_col = np.concatenate([np.full(len(table), case_i+1, dtype=np.int32) for case_i, table in enumerate(tables)])
+    return case_col, np.concatenate(tables)
+
+
+def _value_columns(columns, table, headers):
+    for hdr in headers:
+        columns[_column_name(hdr)] = table[hdr['label']]
+    return columns
+
+
+def _memo_rows(output_dict):
+    rows = [(0, 'modelparams', memo) for memo in output_dict['modelparams']['memos']]
+    for case_i in range(output_dict['cases']):
+        if output_dict['timeseries']:
+            rows += [(case_i+1, 'timeseries', memo) for memo in output_dict['timeseries']['memos'][case_i]]
+        rows += [(case_i+1, 'model', memo) for memo in output_dict['plume']['memos'][case_i]]
+        rows += [(case_i+1, 'postmodel', memo) for memo in output_dict['plume']['postmemos'][case_i]]
+        if output_dict['farfield']['was_run']:
+            rows += [(case_i+1, 'farfield', memo) for memo in output_dict['farfield']['memos'][case_i]]
+    return rows
+
+
+# Columnar alternative to csv_outputs: writes all cases of a run into one file per table (diffuser, ambient, plume,
+# farfield, memos, and tpb when run), each with a case column. file_format is "parquet" or "arrow" (Arrow IPC/Feather).
+def parquet_outputs(output_dict, folderpath, filename_format, file_format="parquet"):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+    except ImportError:
+        raise ImportError("parquet_outputs requires pyarrow (pip install pyarrow)")
+    if file_format == "parquet":
+        extension = "parquet"
+        write_table = pq.write_table
+    elif file_format == "arrow":
+        extension = "arrow"
+        write_table = feather.write_feather
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
+    for ext in (".csv", ".parquet", ".arrow"):
+        if filename_format.lower().endswith(ext):
+            filename_format = filename_format[:-len(ext)]
+
+    if not os.path.exists(folderpath):
+        os.makedirs(folderpath)
+
+    def write(name, columns):
+        write_table(pa.table(columns), os.path.join(folderpath, f"{filename_format}.{name}.{extension}"))
+
+    # diffuser table
+    diff_table = diffuser_table(output_dict)
+    write('diffuser', _value_columns({'case': diff_table['case']}, diff_table, output_dict['diffuser']['headers']))
+
+    # ambient table
+    amb_tables = [ambient_table(output_dict, case_i) for case_i in range(output_dict['cases'])]
+    case_col, amb_table = _concat_cases(amb_tables)
+    level_col = np.concatenate([np.arange(len(table), dtype=np.int32) for table in amb_tables])
+    write('ambient', _value_columns({'case': case_col, 'level': level_col}, amb_table, output_dict['ambient']['headers']))
+
+    # plume table, status dictionary encoded
+    um_tables, statuses = plume_tables(output_dict)
+    case_col, um_table = _concat_cases(um_tables)
+    columns = {'case': case_col, 'step': um_table['step']}
+    _value_columns(columns, um_table, output_dict['plume']['headers'])
+    columns['status'] = pa.DictionaryArray.from_arrays(um_table['status'], pa.array(statuses, type=pa.string()))
+    write('plume', columns)
+
+    # brooks ff table
+    ff_outs = output_dict['farfield']
+    if ff_outs['was_run'] and len(ff_outs['headers']):
+        case_col, ff_table = _concat_cases([farfield_table(output_dict, case_i) for case_i in range(output_dict['cases'])])
+        write('farfield', _value_columns({'case': case_col}, ff_table, ff_outs['headers']))
+
+    # memos (case 0 holds the model parameter memos)
+    memo_rows = _memo_rows(output_dict)
+    write('memos', {
+        'case':   pa.array([row[0] for row in memo_rows], type=pa.int32()),
+        'source': pa.array([row[1] for row in memo_rows], type=pa.string()).dictionary_encode(),
+        'memo':   pa.array([row[2] for row in memo_rows], type=pa.string()),
+    })
+
+    # tidal pollution buildup outputs
+    if output_dict['tpb']['was_run']:
+        write('tpb', {'memo': pa.array(output_dict['tpb']['memos'], type=pa.string())})
@@ -0,0 +1,183 @@
+import copy, math, random
+from statistics import NormalDist
+from visualplumes import Middleware
+from test_sweep import WorkerPool, set_path, update_path
+from test_units import header_meters
+
+
+# Perturbations are given per override path (see test_sweep) as (how, distribution, *params), where how is
+#   "set" -- replace the value with the draw
+#   "add" -- add the draw to the base value (levels without a value, i.e. None, are left to interpolation)
+#   "mul" -- multiply the base value by the draw
+# and distribution is one of DISTRIBUTIONS, e.g.
+#   {"diffuser_params.effluent_flow":   ("set", "uniform", 20.0, 26.0),
+#    "ambient_stack.*.salinity":        ("add", "normal", 0.0, 0.1),
+#    "ambient_stack.*.temperature":     ("add", "triangular", -1.0, 0.0, 1.0)}
+# Each draw is the inverse CDF of a design point in [0, 1), so members are reproducible from the seed and member index.
+DISTRIBUTIONS = {
+    'uniform':    lambda u, low, high: low + u*(high - low),
+    'normal':     lambda u, mean, sd: NormalDist(mean, sd).inv_cdf(min(max(u, 1e-12), 1.0 - 1e-12)),
+    'triangular': lambda u, low, mode, high: (
+        low + math.sqrt(u*(high - low)*(mode - low)) if u < (mode - low)/(high - low)
+        else high - math.sqrt((1.0 - u)*(high - low)*(high - mode))
+    ),
+}
+
+
+def latin_hypercube(members, dims, seed):
+    rng = random.Random(seed)
+    columns = []
+    for dim in range(dims):
+        strata = list(range(members))
+        rng.shuffle(strata)
+        columns.append([(stratum + rng.random())/members for stratum in strata])
+    return [[columns[dim][member] for dim in range(dims)] for member in range(members)]
+
+
+def sobol(members, dims, seed):
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise ImportError("Sobol sampling requires scipy (pip install scipy), or use sampling=\"lhs\"")
+    return qmc.Sobol(d=dims, scramble=True, seed=seed).random(members).tolist()
+
+
+def draw(spec, u):
+    how, distribution, *params = spec
+    return how, DISTRIBUTIONS[distribution](u, *params)
+
+
+def perturb(base_kwargs, perturbations, point):
+    run_kwargs = copy.deepcopy(base_kwargs)
+    drawn = {}
+    for (path, spec), u in zip(perturbations.items(), point):
+        how, value = draw(spec, u)
+        drawn[path] = value
+        if how == "set":
+            set_path(run_kwargs, path, value)
+        elif how == "add":
+            update_path(run_kwargs, path, lambda base: base if base is None else base + value)
+        elif how == "mul":
+            update_path(run_kwargs, path, lambda base: base if base is None else base*value)
+        else:
+            raise ValueError(f"Unknown perturbation: {how}")
+    return run_kwargs, drawn
+
+
+# Default member summary: dilution where the plume crosses the acute mixing zone distance (horizontally from the port),
+# interpolated between output rows, lowest over all cases. Needs the dilution and x (and, if set, y) displacement plume
+# outputs. Cases whose near-field plume ends inside the mixing zone count their final dilution, and mz_reached is the
+# fraction of cases that got there.
+def mixing_zone_dilution(output_dict):
+    diff_headers = output_dict['diffuser']['headers']
+    mz_cols = [i for i, hdr in enumerate(diff_headers)
+               if hdr['name'] == 'acute_mixing_zone' or hdr['label'] == "Mixing zone distance"]
+    names = [hdr['name'] for hdr in output_dict['plume']['headers']]
+    if not mz_cols or 'dilution' not in names or 'x_displacement' not in names:
+        raise ValueError("Mixing zone dilution needs the mixing zone distance and the dilution and x_displacement outputs")
+    mz_col = mz_cols[0]
+    mz_scale = header_meters(diff_headers[mz_col])
+    dil_col = names.index('dilution')
+    x_col = names.index('x_displacement')
+    y_col = names.index('y_displacement') if 'y_displacement' in names else None
+    xy_scale = header_meters(output_dict['plume']['headers'][x_col])
+    dilutions, reached = [], 0
+    for case_i, outputs in enumerate(output_dict['plume']['outputs']):
+        if not len(outputs):
+            continue
+        mz = output_dict['diffuser']['outputs'][case_i][mz_col]*mz_scale
+        prev_distance = prev_dilution = None
+        for output in outputs:
+            values = output['values']
+            distance = xy_scale*math.hypot(values[x_col], values[y_col] if y_col is not None else 0.0)
+            if distance >= mz:
+                if prev_distance is None or distance == prev_distance:
+                    dilutions.append(values[dil_col])
+                else:
+                    fraction = (mz - prev_distance)/(distance - prev_distance)
+                    dilutions.append(prev_dilution + fraction*(values[dil_col] - prev_dilution))
+                reached += 1
+                break
+            prev_distance, prev_dilution = distance, values[dil_col]
+        else:
+            dilutions.append(outputs[-1]['values'][dil_col])
+    if not dilutions:
+        return {}
+    return {'mz_dilution': min(dilutions), 'mz_reached': reached/len(dilutions)}
+
+
+# member summary: lowest final dilution over all cases
+def final_dilution(output_dict):
+    names = [hdr['name'] for hdr in output_dict['plume']['headers']]
+    if 'dilution' not in names:
+        return {}
+    col = names.index('dilution')
+    dilutions = [outputs[-1]['values'][col] for outputs in output_dict['plume']['outputs'] if len(outputs)]
+    return {'dilution': min(dilutions)} if dilutions else {}
+
+
+def _run_member(shared, point):
+    base_kwargs, perturbations, summarize = shared
+    run_kwargs, drawn = perturb(base_kwargs, perturbations, point)
+    output_dict = Middleware.run(**run_kwargs)
+    if not output_dict or not output_dict['success']:
+        return drawn, None, output_dict['error'] if output_dict else "Unknown error"
+    # a member summarize can't reduce is recorded rather than aborting the ensemble
+    try:
+        return drawn, summarize(output_dict), None
+    except Exception as error:
+        return drawn, None, f"{type(error).__name__}: {error}"
+
+
+def _quantile(sorted_values, q):
+    position = q*(len(sorted_values) - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (position - lower)*(sorted_values[upper] - sorted_values[lower])
+
+
+def summary_stats(members, quantiles=(0.05, 0.5, 0.95)):
+    metrics = {}
+    for member in members:
+        for metric, value in (member['summary'] or {}).items():
+            metrics.setdefault(metric, []).append(value)
+    stats = {}
+    for metric, values in metrics.items():
+        values.sort()
+        mean = sum(values)/len(values)
+        stats[metric] = {
+            'count': len(values),
+            'mean':  mean,
+            'std':   math.sqrt(sum((value - mean)**2 for value in values)/(len(values) - 1)) if len(values) > 1 else 0.0,
+            'min':   values[0],
+            'max':   values[-1],
+        }
+        for q in quantiles:
+            stats[metric][f"p{round(q*100):02d}"] = _quantile(values, q)
+    return stats
+
+
+# Runs members perturbed copies of the base scenario (dict of Middleware.run arguments) across worker processes (see
+# test_sweep.WorkerPool). summarize is a top-level function reducing a member's output dict to a dict of scalars (by
+# default the dilution at the acute mixing zone); only those come back from the workers, so output dicts and
+# trajectories are never kept. sampling is "lhs" (Latin hypercube) or "sobol" (needs scipy). Returns the drawn values,
+# summary (or error) of each member, and summary statistics per metric.
+def ensemble(base_kwargs, perturbations, members, summarize=mixing_zone_dilution, sampling="lhs", seed=0, workers=None):
+    if sampling == "lhs":
+        design = latin_hypercube(members, len(perturbations), seed)
+    elif sampling == "sobol":
+        design = sobol(members, len(perturbations), seed)
+    else:
+        raise ValueError(f"Unknown sampling: {sampling}")
+    with WorkerPool(_run_member, (base_kwargs, perturbations, summarize), workers, members) as pool:
+        results = pool.map(design, chunksize=max(1, members//(8*pool.workers)))
+        member_results = [
+            {'member': member, 'drawn': drawn, 'summary': summary, 'error': error}
+            for member, (drawn, summary, error) in enumerate(results)
+        ]
+    return {
+        'seed':     seed,
+        'sampling': sampling,
+        'members':  member_results,
+        'stats':    summary_stats(member_results),
+    }
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+# graph series in output_dict["graphs"], as used by the plot helpers in the scenario scripts
+GRAPH_SERIES = ('trajectory', 'boundary1', 'boundary2', 'path', 'out1', 'out2', 'density', 'ambdensity', 'dilution',
+                'cldilution')
+
+
+# splits coords into runs of finite points, at the non-finite (None/NaN) rows separating cases
+def _segments(coords):
+    points = np.asarray(coords, dtype=float).reshape(-1, 2)
+    finite = np.isfinite(points).all(axis=1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], finite.astype(int), [0]))))
+    return [points[first:last] for first, last in zip(edges[::2], edges[1::2])]
+
+
+def _join_segments(segments):
+    if not segments:
+        return np.empty((0, 2))
+    separator = np.full((1, 2), np.nan)
+    joined = [segments[0]]
+    for segment in segments[1:]:
+        joined += [separator, segment]
+    return np.concatenate(joined)
+
+
+# Largest-triangle-three-buckets downsampling of an (n, 2) point array to at most budget points, keeping the first and
+# last points and, per bucket, the point forming the largest triangle with its neighbors (preserves peaks and turns).
+def lttb(points, budget):
+    n = len(points)
+    if budget >= n:
+        return points
+    if budget < 3:
+        return points[[0, -1]][:budget]
+    sampled = np.empty((budget, 2))
+    sampled[0]  = points[0]
+    sampled[-1] = points[-1]
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    prev = points[0]
+    for i in range(budget - 2):
+        bucket = points[edges[i]:edges[i+1]]
+        if i + 2 < len(edges):
+            after = points[edges[i+1]:edges[i+2]].mean(axis=0)
+        else:
+            after = points[-1]
+        areas = np.abs((prev[0] - after[0])*(bucket[:, 1] - prev[1]) - (prev[0] - bucket[:, 0])*(after[1] - prev[1]))
+        prev = bucket[np.argmax(areas)]
+        sampled[i+1] = prev
+    return sampled
+
+
+# Downsamples coords to about budget points, shared among their segments in proportion to their lengths. Segments are
+# decimated separately and kept apart by NaN rows (which matplotlib draws as line breaks).
+def decimate(coords, budget):
+    segments = _segments(coords)
+    total = sum(len(segment) for segment in segments)
+    if total <= budget:
+        return _join_segments(segments)
+    return _join_segments([lttb(segment, max(2, budget*len(segment)//total)) for segment in segments])
+
+
+def decimate_graphs(graphs, budget):
+    decimated = {}
+    for series_name, series in graphs.items():
+        decimated[series_name] = dict(series)
+        decimated[series_name]['coords'] = decimate(series['coords'], budget).tolist()
+    return decimated
+
+
+# Collects graph series from output dicts added in case order (e.g. from test_stream_run.iter_run), keeping only cases
+# start_case through start_case + max_cases - 1 (like the legacy "Start case for graphs" / "Max detailed graphs"
+# settings). Each added output dict's series are decimated once to case_budget points and kept as their own segments,
+# so every case keeps the same resolution and memory grows by at most case_budget points per series per case. An
+# output dict holding several cases counts as in range if its first case is, and shares one case_budget.
+class GraphCollector:
+
+    def __init__(self, case_budget=500, start_case=1, max_cases=None):
+        self.case_budget = case_budget
+        self.start_case  = start_case
+        self.max_cases   = max_cases
+        self.case_n      = 0
+        self.series      = {}
+        self.series_info = {}
+
+    def in_range(self, case_n):
+        if case_n < self.start_case:
+            return False
+        return self.max_cases is None or case_n < self.start_case + self.max_cases
+
+    def add(self, output_dict):
+        first_case = self.case_n + 1
+        self.case_n += output_dict['cases']
+        if not output_dict.get('graphs') or not self.in_range(first_case):
+            return
+        for series_name, series in output_dict['graphs'].items():
+            if series_name not in self.series:
+                self.series_info[series_name] = {key: value for key, value in series.items() if key != 'coords'}
+                self.series[series_name] = []
+            self.series[series_name] += _segments(decimate(series['coords'], self.case_budget))
+
+    def graphs(self):
+        graphs = {}
+        for series_name, segments in self.series.items():
+            graphs[series_name] = dict(self.series_info[series_name])
+            graphs[series_name]['coords'] = _join_segments(segments).tolist()
+        return graphs
@@ -0,0 +1,92 @@
+import itertools
+from visualplumes import Middleware
+from test_sweep import WorkerPool, apply_overrides
+from test_ensemble import mixing_zone_dilution
+
+
+# Coarse-to-fine grid search over diffuser design parameters. The design space is given per override path (see
+# test_sweep) as (low, high) or (low, high, int) for integer parameters, e.g.
+#   {"diffuser_params.num_ports":      (50, 400, int),
+#    "diffuser_params.port_spacing":   (2.0, 12.0),
+#    "diffuser_params.diameter":       (1.0, 4.0),
+#    "diffuser_params.vertical_angle": (0.0, 90.0)}
+# Each level evaluates a grid of points per parameter, then narrows the bounds to one grid step around the best
+# design. Designs already evaluated are not run again.
+#
+# objective(output_dict, design) is a top-level function returning the score to maximize, or None if the design is
+# infeasible. E.g. maximize the lowest dilution at the acute mixing zone over all time-series cases (mz_dilution, the
+# default), or minimize the port count subject to a dilution target:
+#   def fewest_ports(output_dict, design):
+#       dilution = mz_dilution(output_dict, design)
+#       if dilution is None or dilution < 100: return None
+#       return -design["diffuser_params.num_ports"]
+
+
+# lowest dilution at the acute mixing zone (see test_ensemble.mixing_zone_dilution)
+def mz_dilution(output_dict, design):
+    return mixing_zone_dilution(output_dict).get('mz_dilution')
+
+
+def _axis(bounds, points):
+    low, high, *kind = bounds
+    if points < 2 or high <= low:
+        values = [(low + high)/2.0]
+    else:
+        values = [low + i*(high - low)/(points - 1) for i in range(points)]
+    if kind and kind[0] is int:
+        values = sorted(set(int(round(value)) for value in values))
+    return values
+
+
+def _narrow(space, best, points):
+    narrowed = {}
+    for path, (low, high, *kind) in space.items():
+        step = (high - low)/max(points - 1, 1)
+        narrowed[path] = (max(low, best[path] - step), min(high, best[path] + step), *kind)
+    return narrowed
+
+
+def _design_key(design):
+    return tuple(sorted(design.items()))
+
+
+# (score, error) of a design, where a failed run or objective error is recorded and scores None, so one bad design
+# doesn't abort the search
+def _evaluate(shared, design):
+    base_kwargs, objective = shared
+    output_dict = Middleware.run(**apply_overrides(base_kwargs, design))
+    if not output_dict or not output_dict['success']:
+        return None, output_dict['error'] if output_dict else "Unknown error"
+    try:
+        return objective(output_dict, design), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+# Returns the best design and score, and every (design, score, error) evaluated: score is None for infeasible designs
+# and for failed runs or objective errors, which have the error. Designs are run across worker processes (see
+# test_sweep.WorkerPool).
+def optimize_diffuser(base_kwargs, space, objective=mz_dilution, levels=3, points=5, workers=None):
+    evaluations = {}
+    best_key = None
+    with WorkerPool(_evaluate, (base_kwargs, objective), workers) as pool:
+        bounds = dict(space)
+        for level in range(levels):
+            paths = list(bounds.keys())
+            designs = [
+                dict(zip(paths, values))
+                for values in itertools.product(*(_axis(bounds[path], points) for path in paths))
+            ]
+            designs = [design for design in designs if _design_key(design) not in evaluations]
+            for design, result in zip(designs, pool.map(designs)):
+                evaluations[_design_key(design)] = result
+            feasible = [(score, key) for key, (score, error) in evaluations.items() if score is not None]
+            if not feasible:
+                break
+            best_key = max(feasible)[1]
+            bounds = _narrow(bounds, dict(best_key), points)
+    return {
+        'best':        dict(best_key) if best_key else None,
+        'score':       evaluations[best_key][0] if best_key else None,
+        'evaluations': [(dict(key), score, error) for key, (score, error) in evaluations.items()],
+    }
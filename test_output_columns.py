@@ -0,0 +1,87 @@
+import numpy as np
+
+
+# Columnar views of an output_dict as NumPy structured arrays, one field per output header (by label). Plume status
+# strings are stored as int codes into a statuses list, which can be shared across cases so codes stay consistent.
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def column_dtype(headers, case=False, step=False, status=False):
+    fields = []
+    if case:
+        fields.append(('case', np.int32))
+    if step:
+        fields.append(('step', np.int64))
+    fields += [(hdr['label'], np.float64) for hdr in headers]
+    if status:
+        fields.append(('status', np.int32))
+    return np.dtype(fields)
+
+
+def status_code(statuses, status):
+    try:
+        return statuses.index(status)
+    except ValueError:
+        statuses.append(status)
+        return len(statuses) - 1
+
+
+def plume_table(output_dict, case_i, statuses=None):
+    if statuses is None:
+        statuses = []
+    outputs = output_dict['plume']['outputs'][case_i]
+    table = np.empty(len(outputs), dtype=column_dtype(output_dict['plume']['headers'], step=True, status=True))
+    for row_i, output in enumerate(outputs):
+        table[row_i] = (output['step'], *map(_float, output['values']), status_code(statuses, output['status']))
+    return table
+
+
+def farfield_table(output_dict, case_i):
+    ff_outs = output_dict['farfield']
+    if not ff_outs['was_run']:
+        return None
+    outputs = [output for output in ff_outs['outputs'][case_i] if len(output)]
+    table = np.empty(len(outputs), dtype=column_dtype(ff_outs['headers']))
+    for row_i, output in enumerate(outputs):
+        table[row_i] = tuple(map(_float, output['values']))
+    return table
+
+
+def ambient_table(output_dict, case_i):
+    levels = output_dict['ambient']['outputs'][case_i]
+    table = np.empty(len(levels), dtype=column_dtype(output_dict['ambient']['headers']))
+    for row_i, level in enumerate(levels):
+        table[row_i] = tuple(map(_float, level))
+    return table
+
+
+def diffuser_table(output_dict):
+    outputs = output_dict['diffuser']['outputs']
+    table = np.empty(len(outputs), dtype=column_dtype(output_dict['diffuser']['headers'], case=True))
+    for case_i, values in enumerate(outputs):
+        table[case_i] = (case_i + 1, *map(_float, values))
+    return table
+
+
+# plume tables for all cases, sharing one statuses list
+def plume_tables(output_dict):
+    statuses = []
+    tables = [plume_table(output_dict, case_i, statuses) for case_i in range(output_dict['cases'])]
+    return tables, statuses
+
+
+# lazily rebuilds the output_dict['plume']['outputs'][case_i] row layout from a plume table
+def plume_rows(table, statuses):
+    value_names = table.dtype.names[1:-1]
+    for row in table:
+        yield {
+            'step':   int(row['step']),
+            'values': [float(row[name]) for name in value_names],
+            'status': statuses[row['status']],
+        }
@@ -0,0 +1,104 @@
+import os, copy, math, warnings
+from visualplumes import Middleware
+from test_convert_csv import spanned_memos
+from test_sweep import WorkerPool
+
+
+# output_dict lists holding one entry per case, by section (None for top-level keys)
+CASE_KEYS = {
+    None:         ('casetime',),
+    'diffuser':   ('outputs',),
+    'ambient':    ('outputs',),
+    'plume':      ('outputs', 'memos', 'postmemos'),
+    'farfield':   ('outputs', 'memos'),
+    'timeseries': ('memos',),
+}
+
+
+def case_count(timeseries_handler):
+    ts_units = timeseries_handler.units
+    if not (ts_units.start_time == ts_units.end_time == ts_units.time_increment):
+        raise ValueError("Timeseries start time, end time, and time increment must share the same units to split cases")
+    span = timeseries_handler.end_time - timeseries_handler.start_time
+    # cases run from the start time in whole increments up to (not past) the end time
+    return math.floor(span / timeseries_handler.time_increment + 1e-9) + 1
+
+
+def case_windows(timeseries_handler, chunks):
+    # split the timeseries run into contiguous (start_time, end_time) windows, in the handler's time units
+    start = timeseries_handler.start_time
+    step  = timeseries_handler.time_increment
+    cases = case_count(timeseries_handler)
+    chunks = max(1, min(chunks, cases))
+    windows = []
+    first = 0
+    for i in range(chunks):
+        count = cases // chunks + (1 if i < cases % chunks else 0)
+        windows.append((start + first*step, start + (first + count - 1)*step))
+        first += count
+    return windows
+
+
+def run_window(run_kwargs, window):
+    run_kwargs = dict(run_kwargs)
+    timeseries = copy.copy(run_kwargs['timeseries_handler'])
+    timeseries.start_time, timeseries.end_time = window
+    run_kwargs['timeseries_handler'] = timeseries
+    return Middleware.run(**run_kwargs)
+
+
+def merge_outputs(output_dicts):
+    for output_dict in output_dicts:
+        if not output_dict or not output_dict['success']:
+            return output_dict
+    first  = output_dicts[0]
+    merged = dict(first)
+    for section, keys in CASE_KEYS.items():
+        if section is None:
+            for key in keys:
+                merged[key] = [value for output_dict in output_dicts for value in output_dict[key]]
+        elif first.get(section):
+            merged[section] = dict(first[section])
+            for key in keys:
+                if key in first[section]:
+                    merged[section][key] = [value for output_dict in output_dicts for value in output_dict[section][key]]
+    merged['cases'] = sum(output_dict['cases'] for output_dict in output_dicts)
+    # model parameter memos list the timeseries start/end time, which should span all windows
+    if first.get('modelparams'):
+        merged['modelparams'] = dict(first['modelparams'])
+        merged['modelparams']['memos'] = spanned_memos(first['modelparams']['memos'],
+                                                       output_dicts[-1]['modelparams']['memos'])
+    # graph series are flat coordinate lists covering all cases of a run, with non-finite rows between cases, so
+    # windows are joined with a [None, None] row to keep their last and first cases apart
+    if first.get('graphs'):
+        merged['graphs'] = {}
+        for series_name, series in first['graphs'].items():
+            coords = []
+            for output_dict in output_dicts:
+                if coords:
+                    coords.append([None, None])
+                coords += output_dict['graphs'][series_name]['coords']
+            merged['graphs'][series_name] = dict(series)
+            merged['graphs'][series_name]['coords'] = coords
+    return merged
+
+
+# Same arguments as Middleware.run, plus the number of worker processes (defaults to the CPU count). Cases are split
+# into contiguous time windows, each run in its own process, and merged back in case order. Runs without timeseries or
+# with tidal pollution buildup (a post-pass over all cases) fall back to a single Middleware.run call, with a warning
+# for the latter when workers were asked for. See test_sweep.WorkerPool for running it from scripts.
+def run_parallel(workers=None, **run_kwargs):
+    timeseries = run_kwargs.get('timeseries_handler')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or not timeseries:
+        return Middleware.run(**run_kwargs)
+    if run_kwargs['model_params'].tidal_pollution_buildup:
+        warnings.warn("Tidal pollution buildup needs all cases in one run, running serially", RuntimeWarning, stacklevel=2)
+        return Middleware.run(**run_kwargs)
+    windows = case_windows(timeseries, workers)
+    if len(windows) < 2:
+        return Middleware.run(**run_kwargs)
+    with WorkerPool(run_window, run_kwargs, len(windows)) as pool:
+        output_dicts = list(pool.map(windows))
+    return merge_outputs(output_dicts)
@@ -0,0 +1,119 @@
+import os, time, cProfile, pstats
+import visualplumes
+from visualplumes import Middleware
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(visualplumes.__file__))
+
+# visualplumes module name keywords, checked in order, to the run phase their time is reported under (modules matching
+# none are reported by module name)
+PHASES = (
+    ('units',      'unit conversion'),
+    ('timeseries', 'timeseries interpolation'),
+    ('brooks',     'brooks far-field'),
+    ('farfield',   'brooks far-field'),
+    ('tidal',      'tidal pollution buildup'),
+    ('tpb',        'tidal pollution buildup'),
+    ('graph',      'graphs'),
+    ('output',     'outputs'),
+    ('um3',        'UM3 model'),
+)
+
+
+def _phase(filename):
+    filename = os.path.abspath(filename) if filename.endswith(".py") else filename
+    if not filename.startswith(PACKAGE_DIR):
+        return None
+    module = os.path.relpath(filename, PACKAGE_DIR)[:-3].replace(os.sep, ".")
+    for keyword, phase in PHASES:
+        if keyword in module.lower():
+            return phase
+    return module
+
+
+# self time per phase, with time in builtins and other packages charged to the visualplumes function calling them
+def phase_times(profiler):
+    times = {}
+    for func, (cc, nc, tt, ct, callers) in pstats.Stats(profiler).stats.items():
+        phase = _phase(func[0])
+        if phase:
+            times[phase] = times.get(phase, 0.0) + tt
+            continue
+        for caller, caller_stats in callers.items():
+            caller_phase = _phase(caller[0]) or 'other'
+            times[caller_phase] = times.get(caller_phase, 0.0) + caller_stats[2]
+    return dict(sorted(times.items(), key=lambda item: -item[1]))
+
+
+def _event_name(status):
+    # e.g. "matched energy radial vel = 9.28e-03 m/s" -> "matched energy radial vel"
+    return status.split("=")[0].strip()
+
+
+def case_stats(output_dict):
+    cases = []
+    if not output_dict or not output_dict.get('success'):
+        return cases
+    for case_i, outputs in enumerate(output_dict['plume']['outputs']):
+        events = {}
+        for output in outputs:
+            if output['status']:
+                name = _event_name(output['status'])
+                events[name] = events.get(name, 0) + 1
+        cases.append({
+            'case':   case_i + 1,
+            'steps':  outputs[-1]['step'] if len(outputs) else 0,
+            'rows':   len(outputs),
+            'stop':   _event_name(outputs[-1]['status']) if len(outputs) else "",
+            'events': events,
+        })
+    return cases
+
+
+# Same arguments as Middleware.run, plus:
+#   detailed -- run under cProfile and report time per run phase (adds profiling overhead to the wall time)
+#   callback -- called with the profile dict when the run finishes
+# Returns the output dict with output_dict['profile'] holding the wall time, phase times, per-case step counts and
+# status events, and the count of cases per stop reason (the status of the last output row).
+def profile_run(detailed=True, callback=None, **run_kwargs):
+    profiler = cProfile.Profile() if detailed else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        output_dict = Middleware.run(**run_kwargs)
+    finally:
+        if profiler:
+            profiler.disable()
+    wall_time = time.perf_counter() - start
+
+    cases = case_stats(output_dict)
+    stop_reasons = {}
+    for case in cases:
+        stop_reasons[case['stop']] = stop_reasons.get(case['stop'], 0) + 1
+    profile = {
+        'wall_time':    wall_time,
+        'phases':       phase_times(profiler) if profiler else {},
+        'cases':        cases,
+        'steps':        sum(case['steps'] for case in cases),
+        'stop_reasons': stop_reasons,
+    }
+    if output_dict is not None:
+        output_dict['profile'] = profile
+    if callback:
+        callback(profile)
+    return output_dict
+
+
+def print_profile(profile):
+    print(f"Wall time: {profile['wall_time']:.3f} s, {len(profile['cases'])} cases, {profile['steps']} steps")
+    if profile['phases']:
+        total = sum(profile['phases'].values())
+        print("")
+        print(f"{'Phase':<32} {'Time (s)':>9} {'Share':>7}")
+        for phase, seconds in profile['phases'].items():
+            print(f"{phase:<32} {seconds:9.3f} {seconds/total if total else 0.0:7.1%}")
+    print("")
+    print(f"{'Stop reason':<32} {'Cases':>9}")
+    for stop, count in sorted(profile['stop_reasons'].items(), key=lambda item: -item[1]):
+        print(f"{stop or '(none)':<32} {count:9d}")
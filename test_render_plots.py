@@ -0,0 +1,87 @@
+import os
+from test_convert_csv import case_number_format
+from test_graphs import GRAPH_SERIES, decimate_graphs
+from test_sweep import WorkerPool
+
+
+# Standard figures, as made by hand with the plot helpers in the scenario scripts: (series, flip_y)
+FIGURES = {
+    'trajectory_profileview': (('trajectory', 'boundary1', 'boundary2'), True),
+    'trajectory_planview':    (('path', 'out1', 'out2'), False),
+    'density_bydepth':        (('density', 'ambdensity'), True),
+    'dilution_bydistance':    (('dilution', 'cldilution'), False),
+}
+SERIES_COLORS = ("black", "blue", "green")
+
+
+# Draws the figures for one graphs dict to PNG, returning the file paths written. Series missing from the graphs are
+# skipped, as are figures with none of their series. Figures are drawn with matplotlib's Figure API, which renders
+# without a GUI and leaves the pyplot backend alone.
+def render_graphs(graphs, filepath_format, figures=tuple(FIGURES), figsize=(6.4, 4.8), dpi=100):
+    from matplotlib.figure import Figure
+    filepaths = []
+    for figure_name in figures:
+        series_names, flip_y = FIGURES[figure_name]
+        series_names = [series_name for series_name in series_names if graphs.get(series_name)]
+        if not series_names:
+            continue
+        fig = Figure(figsize=figsize, dpi=dpi)
+        ax = fig.add_subplot()
+        for series_name, color in zip(series_names, SERIES_COLORS):
+            coords = graphs[series_name]['coords']
+            if not len(coords):
+                continue
+            xs, ys = zip(*coords)
+            ax.plot(xs, ys, linewidth=1, color=color, alpha=0.2)
+            ax.scatter(xs, ys, s=1, color=color)
+        if flip_y:
+            ax.invert_yaxis()
+        filepath = filepath_format.format(figure_name)
+        fig.savefig(filepath)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def _render_task(options, task):
+    graphs, filepath_format = task
+    return render_graphs(graphs, filepath_format, *options)
+
+
+# Writes the standard figures (names from FIGURES) to PNG for each output dict, as
+#   {folderpath}/{filename_format}.{case}.{figure}.png
+# output_iter yields one output dict per case in case order (e.g. test_stream_run.iter_run), or pass [output_dict] for
+# a single run, whose graphs cover all of its cases in one set of figures. Only cases in the cases collection are drawn
+# (all if None). Series are downsampled to the figure's pixel width before being sent to the worker processes (see
+# test_sweep.WorkerPool). Returns the file paths written, in case order.
+#
+# Runs with tidal pollution buildup can't be split by case (iter_run raises), but the buildup doesn't change the plume
+# graphs, so per-case figures for them (e.g. TRwtp.py) can come from test_reuse_cases.iter_run_reusing with
+# skip_tpb=True, which also draws repeated cases from the reused results.
+def render_outputs(output_iter, folderpath, filename_format, cases=None, figures=tuple(FIGURES), figsize=(6.4, 4.8),
+                   dpi=100, total_cases=None, workers=None):
+    if not os.path.exists(folderpath):
+        os.makedirs(folderpath)
+    if filename_format.lower().endswith(".png"):
+        filename_format = filename_format[:-4]
+    case_format = case_number_format(total_cases or (max(cases) if cases else 1))
+    budget = int(figsize[0]*dpi)
+    results = []
+    with WorkerPool(_render_task, (figures, figsize, dpi), workers) as pool:
+        case_n = 0
+        for output_dict in output_iter:
+            if not output_dict or not output_dict['success']:
+                break
+            case_n += 1
+            if cases is not None and case_n not in cases:
+                continue
+            graphs = {
+                series_name: series for series_name, series in (output_dict.get('graphs') or {}).items()
+                if series_name in GRAPH_SERIES
+            }
+            if not graphs:
+                continue
+            filepath_format = os.path.join(folderpath, f"{filename_format}.{case_format.format(case_n)}.{{0}}.png")
+            # submitted as each case arrives, so drawing overlaps with producing the next case
+            results.append(pool.submit((decimate_graphs(graphs, budget), filepath_format)))
+        filepaths = [filepath for result in results for filepath in result.result()]
+    return filepaths
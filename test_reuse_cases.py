@@ -0,0 +1,149 @@
+import os, csv, copy, math
+from collections import OrderedDict
+from visualplumes import units
+from test_parallel_run import case_count, case_windows, run_window, merge_outputs
+
+
+# Timeseries cases often repeat the same inputs (e.g. TRwtp's flowrate.csv repeats 0.021087 MGD for hours while
+# current_dir.csv stays 0), so cases are fingerprinted by the timeseries rows they resolve to and only run once per
+# fingerprint. Everything else in the scenario is the same for all cases, so equal fingerprints mean equal inputs.
+#
+# The timeseries files are read from the timeseries handler (handler_series), and files shorter than the run are
+# cycled, as in the handler. Each case that is run also checks its "Timeseries indices:" memo against the rows read,
+# raising ValueError if they disagree, so a misread handler can't silently reuse results.
+#
+# Tidal pollution buildup needs all cases in one run, so scenarios using it (e.g. TRwtp.py) raise ValueError unless
+# skip_tpb is set, which runs the cases with it turned off: near-field and far-field results are the same, but there
+# are no tidal pollution buildup results.
+
+
+def read_timeseries(filepath, depth_row):
+    rows = []
+    with open(filepath, newline='') as fcsv:
+        for row in csv.reader(fcsv):
+            values = [value.strip() for value in row if value.strip() != ""]
+            if values:
+                rows.append(tuple(float(value) for value in values))
+    return rows[1:] if depth_row else rows
+
+
+def _ts_source(name, ts):
+    values = list(vars(ts).values())
+    filepaths = [value for value in values if isinstance(value, str) and os.path.isfile(value)]
+    stores = [value for value in values if hasattr(value, 'ts_increment')]
+    if len(filepaths) != 1 or len(stores) != 1:
+        raise ValueError(f"Can't find the file and store of timeseries {name}")
+    return filepaths[0], stores[0]
+
+
+# (rows, ts_increment in hours) of each DiffuserTimeseries/AmbientTimeseries set in the timeseries handler, in the order
+# of its "Timeseries indices:" memo: diffuser timeseries, then ambient ones, each in the handler's attribute order.
+# Each holds its file path and the store it was created with, whose ts_increment is in hours. Ambient files start with
+# a row of depths.
+def handler_series(timeseries_handler):
+    series = []
+    for group, depth_row in ((timeseries_handler.diffuser, False), (timeseries_handler.ambient, True)):
+        for name, ts in vars(group).items():
+            if ts is None or not hasattr(ts, '__dict__'):
+                continue
+            filepath, store = _ts_source(name, ts)
+            series.append((read_timeseries(filepath, depth_row), store.ts_increment))
+    return series
+
+
+def _row_index(rows, increment, case_hours):
+    position = case_hours / increment
+    index = int(math.floor(position + 1e-9))
+    return index, position - index
+
+
+# timeseries rows a case resolves to (both bracketing rows and the fraction between them when interpolated)
+def case_fingerprint(series, case_hours):
+    key = []
+    for rows, increment in series:
+        index, fraction = _row_index(rows, increment, case_hours)
+        key.append(rows[index % len(rows)])
+        if fraction > 1e-9:
+            key.append((rows[(index + 1) % len(rows)], round(fraction, 9)))
+    return tuple(key)
+
+
+def _check_indices(output_dict, series, case_hours):
+    if not output_dict['timeseries']:
+        return
+    memos = [memo for memo in output_dict['timeseries']['memos'][0] if memo.startswith("Timeseries indices:")]
+    if not memos:
+        return
+    indices = [int(index) for index in memos[0].split(":", 1)[1].split(",")]
+    if len(indices) != len(series):
+        raise ValueError(f"Read {len(series)} timeseries from the handler, but its memo lists {len(indices)}")
+    expected = [_row_index(rows, increment, case_hours)[0] % len(rows) for rows, increment in series]
+    if [index % len(rows) for index, (rows, increment) in zip(indices, series)] != expected:
+        raise ValueError(f"Timeseries rows {expected} read from the handler don't match its indices {indices} at "
+                         f"{case_hours} hours")
+
+
+def _reused_case(source, source_n, source_hours, series, case_hours):
+    output_dict = copy.deepcopy(source)
+    # offset from the source case's own time, whatever the engine counts it from
+    output_dict['casetime'] = [source['casetime'][0] + (case_hours - source_hours)*3600.0]
+    if output_dict['timeseries']:
+        indices = [_row_index(rows, increment, case_hours)[0] % len(rows) for rows, increment in series]
+        memos = [memo for memo in output_dict['timeseries']['memos'][0] if not memo.startswith("Timeseries indices:")]
+        memos.insert(0, "Timeseries indices: " + ", ".join(str(index) for index in indices))
+        memos.append(f"Reused results of case {source_n} (same timeseries inputs)")
+        output_dict['timeseries']['memos'] = [memos]
+    return output_dict
+
+
+# Like test_stream_run.iter_run (one output dict per case), but cases whose timeseries inputs match an earlier case
+# reuse that result, retagged with their own case time. Up to max_cached distinct results are kept for reuse. If a stats
+# dict is given, it is updated with the 'cases' run so far and how many were 'reused'.
+def iter_run_reusing(stats=None, max_cached=256, skip_tpb=False, **run_kwargs):
+    timeseries = run_kwargs['timeseries_handler']
+    if run_kwargs['model_params'].tidal_pollution_buildup:
+        if not skip_tpb:
+            raise ValueError("Tidal pollution buildup needs all cases in one run, use Middleware.run instead (or "
+                             "skip_tpb=True to run without it)")
+        run_kwargs = dict(run_kwargs)
+        run_kwargs['model_params'] = copy.copy(run_kwargs['model_params'])
+        run_kwargs['model_params'].tidal_pollution_buildup = False
+    if timeseries.units.start_time != units.Time.HOURS or timeseries.units.time_increment != units.Time.HOURS:
+        raise ValueError("Timeseries start time and time increment must be in hours to match timeseries rows")
+    series = handler_series(timeseries)
+    if stats is None:
+        stats = {}
+    stats.update(cases=0, reused=0)
+    computed = OrderedDict()
+    for case_i, window in enumerate(case_windows(timeseries, case_count(timeseries))):
+        case_hours = window[0]
+        key = case_fingerprint(series, case_hours)
+        stats['cases'] += 1
+        if key in computed:
+            computed.move_to_end(key)
+            source_n, source_hours, source = computed[key]
+            stats['reused'] += 1
+            yield _reused_case(source, source_n, source_hours, series, case_hours)
+            continue
+        output_dict = run_window(run_kwargs, window)
+        if output_dict and output_dict['success']:
+            _check_indices(output_dict, series, case_hours)
+        yield output_dict
+        if not output_dict or not output_dict['success']:
+            return
+        computed[key] = (case_i + 1, case_hours, output_dict)
+        if len(computed) > max_cached:
+            computed.popitem(last=False)
+
+
+# Same arguments as Middleware.run (plus max_cached and skip_tpb), returning one output dict for all cases, with the
+# reuse count added to the model parameter memos.
+def run_reusing(max_cached=256, skip_tpb=False, **run_kwargs):
+    stats = {}
+    output_dicts = list(iter_run_reusing(stats, max_cached, skip_tpb, **run_kwargs))
+    output_dict = merge_outputs(output_dicts)
+    if output_dict and output_dict['success'] and output_dict.get('modelparams'):
+        output_dict['modelparams']['memos'] = output_dict['modelparams']['memos'] + [
+            f"Reused results: {stats['reused']} of {stats['cases']} cases (same timeseries inputs)"
+        ]
+    return output_dict
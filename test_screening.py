@@ -0,0 +1,292 @@
+import os, re, json, math
+import numpy as np
+from visualplumes import Middleware
+from test_sweep import WorkerPool, apply_overrides
+from test_units import LENGTH_FACTORS, FLOW_FACTORS, SPEED_FACTORS, to_si, to_celsius, to_psu, header_meters
+
+
+# Screening table of near-field results indexed by nondimensional numbers of the scenario, so single-case scenarios can
+# be answered without running the model. The table is a JSON file of entries {'numbers', 'results', 'reported'} built
+# from full runs (build_table), and queries interpolate the results of the nearest entries (ScreeningTable.lookup), or
+# fall back to a full Middleware.run when the scenario lies outside the table (screen_or_run).
+#
+# The numbers are computed from the Middleware.run arguments (scenario_numbers), the same way for building and for
+# queries, with the definitions of the numbers UM3 reports per case:
+#   froude      -- densimetric Froude number V/sqrt(|g'| D), negative for effluent denser than the ambient
+#   strat       -- D (d rho_a/d depth)/(rho_a - rho_e)
+#   spacing     -- port spacing/D (0 for a single port)
+#   k           -- V/u_a (u_a floored at 1e-5 m/s)
+#   submergence -- port depth/D
+#   angle       -- vertical angle (deg)
+# where V is the effluent velocity from the total flow over the port areas, D the port diameter, g' = g (rho_a -
+# rho_e)/rho_a, and ambient values are taken at the port depth, interpolated linearly between ambient levels and held
+# constant above and below them. Densities use the one-atmosphere UNESCO equation of state, so they can differ from
+# UM3's slightly; 'reported' keeps UM3's Froude No, Strat No, Spcg No and k memos of each entry for comparison.
+#
+# Results are stored divided by the port diameter where they are lengths, and rescaled by the query scenario's:
+#   trap_rise                   -- rise of the first "trap level" row above the port (m)
+#   trap_dilution               -- dilution at that row
+#   final_dilution              -- dilution of the last plume output row
+#   trap_cl_dilution, final_cl_dilution -- the same for centerline dilution, if cl_dilution is an output
+#   cl, lmz                     -- horizontal CL and Lmz distances (m) from the post-model memos
+
+NUMBER_MEMOS = {'froude': "Froude No", 'strat': "Strat No", 'spacing': "Spcg No", 'k': "k"}
+# numbers are compared on a signed log scale, log10(1 + |x|/scale), to span their orders of magnitude, or linearly as
+# x/scale for those listed in LINEAR_NUMBERS
+NUMBER_SCALES  = {'froude': 1.0, 'strat': 1e-6, 'spacing': 1.0, 'k': 1.0, 'submergence': 1.0, 'angle': 45.0}
+LINEAR_NUMBERS = ('angle',)
+LENGTH_RESULTS = ('trap_rise', 'cl', 'lmz')
+RESULT_MEMOS   = {'cl': "CL(m)", 'lmz': "Lmz(m)"}
+
+GRAVITY        = 9.80665
+MIN_CURRENT    = 1e-5
+
+_MEMO_VALUE = re.compile(r"^\s*([A-Za-z][\w ()]*?):\s*([-+]?[\d.]+(?:[eE][-+]?\d+)?)")
+
+
+def _memo_values(memos):
+    values = {}
+    for memo in memos:
+        match = _MEMO_VALUE.match(memo)
+        if match:
+            values[match.group(1).strip()] = float(match.group(2))
+    return values
+
+
+# seawater density (kg/m3) at one atmosphere, UNESCO (1981)
+def density(salinity, temperature):
+    t = temperature
+    rho_w = (999.842594 + 6.793952e-2*t - 9.095290e-3*t**2 + 1.001685e-4*t**3 - 1.120083e-6*t**4
+             + 6.536332e-9*t**5)
+    a = 8.24493e-1 - 4.0899e-3*t + 7.6438e-5*t**2 - 8.2467e-7*t**3 + 5.3875e-9*t**4
+    b = -5.72466e-3 + 1.0227e-4*t - 1.6546e-6*t**2
+    return rho_w + a*salinity + b*max(salinity, 0.0)**1.5 + 4.8314e-4*salinity**2
+
+
+def _ambient_profile(ambient_stack, ambient_store, name, convert):
+    store = getattr(ambient_store, name)
+    points = sorted(
+        (to_si(level.z, ambient_store.z.units, LENGTH_FACTORS), convert(getattr(level, name), store.units))
+        for level in ambient_stack if getattr(level, name) is not None
+    )
+    if not points:
+        raise ValueError(f"Screening needs an ambient {name} value")
+    return points
+
+
+def _interpolate(points, depth):
+    depths = [point[0] for point in points]
+    values = [point[1] for point in points]
+    return float(np.interp(depth, depths, values))
+
+
+# nondimensional numbers of a single-case scenario (Middleware.run arguments), and the port diameter and depth (m)
+# used to scale its results
+def scenario_numbers(run_kwargs):
+    if run_kwargs.get('timeseries_handler'):
+        raise ValueError("Screening needs a single-case scenario, without a timeseries handler")
+    diff_params = run_kwargs['diffuser_params']
+    diff_store  = run_kwargs['diffuser_store']
+    ambient_store = run_kwargs['ambient_store']
+    if not getattr(ambient_store, 'z_is_depth', True):
+        raise ValueError("Screening needs ambient levels given by depth")
+    diameter = to_si(diff_params.diameter, diff_store.diameter.units, LENGTH_FACTORS)
+    depth    = to_si(diff_params.depth, diff_store.depth.units, LENGTH_FACTORS)
+    ports    = max(1, int(diff_params.num_ports or 1))
+    flow     = to_si(diff_params.effluent_flow, diff_store.effluent_flow.units, FLOW_FACTORS)
+    velocity = flow/(ports*math.pi*diameter**2/4.0)
+    rho_e = density(to_psu(diff_params.salinity, diff_store.salinity.units),
+                    to_celsius(diff_params.temperature, diff_store.temperature.units))
+
+    ambient_stack = run_kwargs['ambient_stack']
+    salinity    = _ambient_profile(ambient_stack, ambient_store, 'salinity', to_psu)
+    temperature = _ambient_profile(ambient_stack, ambient_store, 'temperature', to_celsius)
+    current     = _ambient_profile(ambient_stack, ambient_store, 'current_speed',
+                                   lambda value, unit: to_si(value, unit, SPEED_FACTORS))
+
+    def rho_a(at):
+        return density(_interpolate(salinity, at), _interpolate(temperature, at))
+
+    step = 0.1
+    gradient = (rho_a(depth + step) - rho_a(max(depth - step, 0.0)))/(depth + step - max(depth - step, 0.0))
+    delta = rho_a(depth) - rho_e
+    if delta == 0.0:
+        raise ValueError("Screening needs effluent and ambient densities that differ")
+    reduced_gravity = GRAVITY*delta/rho_a(depth)
+    spacing = 0.0
+    if ports > 1:
+        spacing = to_si(diff_params.port_spacing, diff_store.port_spacing.units, LENGTH_FACTORS)/diameter
+    numbers = {
+        'froude':      math.copysign(velocity/math.sqrt(abs(reduced_gravity)*diameter), delta),
+        'strat':       diameter*gradient/delta,
+        'spacing':     spacing,
+        'k':           velocity/max(_interpolate(current, depth), MIN_CURRENT),
+        'submergence': depth/diameter,
+        'angle':       diff_params.vertical_angle,
+    }
+    return numbers, {'diameter': diameter, 'depth': depth}
+
+
+# nondimensional results of case_i of a run of a scenario with the given scales (from scenario_numbers)
+def case_results(output_dict, case_i, scales):
+    headers = output_dict['plume']['headers']
+    names = [hdr['name'] for hdr in headers]
+    outputs = output_dict['plume']['outputs'][case_i]
+    results = {}
+    dilution_cols = [(key, names.index(name)) for key, name in (('dilution', 'dilution'), ('cl_dilution', 'cl_dilution'))
+                     if name in names]
+    if len(outputs):
+        for key, col in dilution_cols:
+            results[f"final_{key}"] = outputs[-1]['values'][col]
+    for output in outputs:
+        if output['status'].startswith("trap level"):
+            if 'depth' in names:
+                col = names.index('depth')
+                trap_depth = output['values'][col]*header_meters(headers[col])
+                results['trap_rise'] = (scales['depth'] - trap_depth)/scales['diameter']
+            for key, col in dilution_cols:
+                results[f"trap_{key}"] = output['values'][col]
+            break
+    post_values = _memo_values(output_dict['plume']['postmemos'][case_i])
+    for key, label in RESULT_MEMOS.items():
+        if label in post_values:
+            results[key] = post_values[label]/scales['diameter']
+    return results
+
+
+def reported_numbers(output_dict, case_i):
+    memo_values = _memo_values(output_dict['plume']['memos'][case_i])
+    return {key: memo_values[label] for key, label in NUMBER_MEMOS.items() if label in memo_values}
+
+
+def load_table(filepath):
+    if not os.path.exists(filepath):
+        return []
+    with open(filepath) as fjson:
+        return json.load(fjson)['entries']
+
+
+def save_table(filepath, entries):
+    with open(filepath, 'w') as fjson:
+        json.dump({'entries': entries}, fjson)
+
+
+def _table_entry(base_kwargs, overrides):
+    run_kwargs = apply_overrides(base_kwargs, overrides)
+    numbers, scales = scenario_numbers(run_kwargs)
+    output_dict = Middleware.run(**run_kwargs)
+    if not output_dict or not output_dict['success'] or not output_dict['cases']:
+        return None
+    return {
+        'numbers':  numbers,
+        'results':  case_results(output_dict, 0, scales),
+        'reported': reported_numbers(output_dict, 0),
+    }
+
+
+def _number_key(numbers):
+    return tuple(sorted((key, round(value, 12)) for key, value in numbers.items()))
+
+
+# Runs the base scenario (dict of single-case Middleware.run arguments) once per overrides dict (see test_sweep, e.g.
+# from test_sweep.grid) across worker processes (see test_sweep.WorkerPool), and adds the entries to the table file,
+# creating or extending it. Entries already in the table, by their numbers, are not added again.
+def build_table(filepath, base_kwargs, overrides, workers=None):
+    overrides = list(overrides)
+    entries = load_table(filepath)
+    known = set(_number_key(entry['numbers']) for entry in entries)
+    with WorkerPool(_table_entry, base_kwargs, workers, len(overrides)) as pool:
+        for entry in pool.map(overrides):
+            if entry and _number_key(entry['numbers']) not in known:
+                known.add(_number_key(entry['numbers']))
+                entries.append(entry)
+    save_table(filepath, entries)
+    return entries
+
+
+def _scaled(numbers):
+    scaled = []
+    for key, scale in NUMBER_SCALES.items():
+        value = numbers.get(key, 0.0)
+        if key in LINEAR_NUMBERS:
+            scaled.append(value/scale)
+        else:
+            scaled.append(math.copysign(math.log10(1.0 + abs(value)/scale), value))
+    return scaled
+
+
+def _rescaled(results, scales):
+    return {key: value*scales['diameter'] if key in LENGTH_RESULTS else value for key, value in results.items()}
+
+
+class ScreeningTable:
+
+    # max_distance is the farthest the nearest entry may be from a query, in scaled numbers (a decade of a log-scaled
+    # number, or 45 degrees of vertical angle, is 1)
+    def __init__(self, entries, neighbors=8, max_distance=0.15):
+        self.entries      = entries
+        self.neighbors    = neighbors
+        self.max_distance = max_distance
+        self.points       = np.array([_scaled(entry['numbers']) for entry in entries], dtype=float).reshape(-1, len(NUMBER_SCALES))
+
+    @classmethod
+    def load(cls, filepath, neighbors=8, max_distance=0.15):
+        return cls(load_table(filepath), neighbors, max_distance)
+
+    # Interpolated nondimensional results for the given numbers by inverse-distance weighting of the nearest entries,
+    # with the weighted spread of their values as the error estimate. Returns None when the query lies outside the
+    # range of the table in any number, or farther than max_distance from every entry.
+    def lookup(self, numbers):
+        if not self.entries:
+            return None
+        query = np.array(_scaled(numbers))
+        if np.any(query < self.points.min(axis=0)) or np.any(query > self.points.max(axis=0)):
+            return None
+        distances = np.sqrt(((self.points - query)**2).sum(axis=1))
+        nearest = np.argsort(distances)[:self.neighbors]
+        if distances[nearest[0]] > self.max_distance:
+            return None
+        if distances[nearest[0]] == 0.0:
+            entry = self.entries[nearest[0]]
+            return {'results': dict(entry['results']), 'error': {key: 0.0 for key in entry['results']},
+                    'distance': 0.0}
+        weights = (1.0/distances[nearest]**2).tolist()
+        results, error = {}, {}
+        keys = set(key for i in nearest for key in self.entries[i]['results'])
+        for key in keys:
+            pairs = [(weight, self.entries[i]['results'][key]) for weight, i in zip(weights, nearest)
+                     if self.entries[i]['results'].get(key) is not None]
+            if not pairs:
+                continue
+            total = sum(weight for weight, value in pairs)
+            mean = sum(weight*value for weight, value in pairs)/total
+            results[key] = mean
+            error[key] = math.sqrt(sum(weight*(value - mean)**2 for weight, value in pairs)/total)
+        return {'results': results, 'error': error, 'distance': float(distances[nearest[0]])}
+
+    # Screening answer for a single-case scenario (Middleware.run arguments), with results and errors in metres and
+    # dilutions, or None if it lies outside the table.
+    def screen(self, **run_kwargs):
+        numbers, scales = scenario_numbers(run_kwargs)
+        answer = self.lookup(numbers)
+        if answer:
+            answer['results'] = _rescaled(answer['results'], scales)
+            answer['error'] = _rescaled(answer['error'], scales)
+            answer['numbers'] = numbers
+        return answer
+
+
+# Screening answer for a single-case scenario (same arguments as Middleware.run) from the table, or, when it lies
+# outside the table, the results of a full run. The 'source' key tells which one was used.
+def screen_or_run(table, **run_kwargs):
+    answer = table.screen(**run_kwargs)
+    if answer:
+        answer['source'] = 'table'
+        return answer
+    numbers, scales = scenario_numbers(run_kwargs)
+    output_dict = Middleware.run(**run_kwargs)
+    if not output_dict or not output_dict['success'] or not output_dict['cases']:
+        return None
+    results = _rescaled(case_results(output_dict, 0, scales), scales)
+    return {'results': results, 'error': {key: 0.0 for key in results}, 'distance': None, 'source': 'run',
+            'numbers': numbers}
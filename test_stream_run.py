@@ -0,0 +1,19 @@
+from visualplumes import Middleware
+from test_parallel_run import case_count, case_windows, run_window
+
+
+# Same arguments as Middleware.run, but yields one output dict per case (each with 'cases' == 1), so a run's cases
+# don't have to be held in memory together. Each case is its own Middleware.run over a one-case timeseries window.
+# Runs without timeseries yield their single output dict. Stops after yielding a failed run.
+def iter_run(**run_kwargs):
+    timeseries = run_kwargs.get('timeseries_handler')
+    if not timeseries:
+        yield Middleware.run(**run_kwargs)
+        return
+    if run_kwargs['model_params'].tidal_pollution_buildup:
+        raise ValueError("Tidal pollution buildup needs all cases in one run, use Middleware.run instead")
+    for window in case_windows(timeseries, case_count(timeseries)):
+        output_dict = run_window(run_kwargs, window)
+        yield output_dict
+        if not output_dict or not output_dict['success']:
+            return
@@ -0,0 +1,156 @@
+import os, copy, itertools
+from concurrent.futures import Future, ProcessPoolExecutor
+from visualplumes import Middleware
+
+
+# Overrides are dicts of "path": value, where the path starts with a Middleware.run argument name and walks attributes
+# or sequence indices, e.g.
+#   "diffuser_params.effluent_flow"  -> diffuser_params.effluent_flow
+#   "ambient_stack.0.ff_velocity"    -> ambient_stack[0].ff_velocity
+#   "ambient_stack.*.decay_rate"     -> decay_rate on every ambient level
+def _targets(run_kwargs, path):
+    name, *attrs = path.split(".")
+    targets = [run_kwargs[name]]
+    for attr in attrs[:-1]:
+        if attr == "*":
+            targets = [item for target in targets for item in target]
+        elif attr.isdigit():
+            targets = [target[int(attr)] for target in targets]
+        else:
+            targets = [getattr(target, attr) for target in targets]
+    # setattr would quietly add a misspelled attribute and leave the scenario unchanged
+    for target in targets:
+        if not hasattr(target, attrs[-1]):
+            raise AttributeError(f"{type(target).__name__} has no attribute {attrs[-1]!r} (override path {path!r})")
+    return targets, attrs[-1]
+
+
+def set_path(run_kwargs, path, value):
+    if "." not in path:
+        run_kwargs[path] = value
+        return
+    targets, attr = _targets(run_kwargs, path)
+    for target in targets:
+        setattr(target, attr, value)
+
+
+# sets each value at the path to func(current value)
+def update_path(run_kwargs, path, func):
+    if "." not in path:
+        run_kwargs[path] = func(run_kwargs[path])
+        return
+    targets, attr = _targets(run_kwargs, path)
+    for target in targets:
+        setattr(target, attr, func(getattr(target, attr)))
+
+
+# all combinations of the values per path, e.g. grid({"diffuser_params.effluent_flow": [20, 25], ...})
+def grid(axes):
+    paths = list(axes.keys())
+    return [dict(zip(paths, values)) for values in itertools.product(*(axes[path] for path in paths))]
+
+
+def apply_overrides(base_kwargs, overrides):
+    run_kwargs = copy.deepcopy(base_kwargs)
+    for path, value in overrides.items():
+        set_path(run_kwargs, path, value)
+    return run_kwargs
+
+
+# the function and shared arguments a worker process was started with
+_worker_args = None
+
+
+def _init_worker(func, shared):
+    global _worker_args
+    _worker_args = (func, shared)
+
+
+def _call(item):
+    func, shared = _worker_args
+    return func(shared, item)
+
+
+# Process pool calling func(shared, item) per item, where func is a top-level function and shared (e.g. the base
+# scenario) is sent once to each worker process rather than once per item. workers defaults to the CPU count, capped at
+# tasks if given; with fewer than 2 workers, items are run in this process. Use as a context manager, e.g.
+#   with WorkerPool(run_variant, base_kwargs, workers, len(variants)) as pool:
+#       output_dicts = list(pool.map(variants))
+# Note: on platforms that spawn processes (Windows, macOS), calling scripts must guard with if __name__ == "__main__".
+class WorkerPool:
+
+    def __init__(self, func, shared, workers=None, tasks=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if tasks is not None:
+            workers = min(workers, tasks)
+        self.func     = func
+        self.shared   = shared
+        self.workers  = max(1, workers)
+        self.executor = None
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(func, shared))
+
+    # results in the same order as the items, computed lazily
+    def map(self, items, chunksize=1):
+        if self.executor:
+            return self.executor.map(_call, items, chunksize=chunksize)
+        return (self.func(self.shared, item) for item in items)
+
+    # future for one item, run now if in-process
+    def submit(self, item):
+        if self.executor:
+            return self.executor.submit(_call, item)
+        future = Future()
+        try:
+            future.set_result(self.func(self.shared, item))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def run_variant(base_kwargs, overrides):
+    return Middleware.run(**apply_overrides(base_kwargs, overrides))
+
+
+class SweepResults:
+
+    def __init__(self, variants, output_dicts):
+        self.variants = variants
+        self.outputs  = output_dicts
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def __getitem__(self, i):
+        return self.outputs[i]
+
+    def __iter__(self):
+        return iter(zip(self.variants, self.outputs))
+
+    # output dicts of all variants whose overrides match every given path/value
+    def find(self, overrides):
+        return [
+            output_dict for variant, output_dict in self
+            if all(path in variant and variant[path] == value for path, value in overrides.items())
+        ]
+
+
+# Runs the base scenario (dict of Middleware.run arguments) once per overrides dict, across worker processes (see
+# WorkerPool). Results are returned in the same order as the overrides.
+def sweep(base_kwargs, overrides, workers=None):
+    variants = [dict(variant) for variant in overrides]
+    with WorkerPool(run_variant, base_kwargs, workers, len(variants)) as pool:
+        output_dicts = list(pool.map(variants))
+    return SweepResults(variants, output_dicts)
@@ -0,0 +1,52 @@
+# SI conversions of parameter and output units. Parameter store units are converted by unit name (e.g.
+# diffuser_store.diameter.units.name == "FEET"), and output headers by their units label (e.g. "ft").
+
+# SI factors by unit name of the parameter stores
+LENGTH_FACTORS = {'METERS': 1.0, 'CENTIMETERS': 0.01, 'MILLIMETERS': 0.001, 'KILOMETERS': 1000.0, 'FEET': 0.3048,
+                  'INCHES': 0.0254, 'YARDS': 0.9144, 'FATHOMS': 1.8288, 'MILES': 1609.344}
+FLOW_FACTORS   = {'CUBIC_METERS_PER_SECOND': 1.0, 'CUBIC_METERS_PER_DAY': 1.0/86400, 'LITERS_PER_SECOND': 0.001,
+                  'MEGALITERS_PER_DAY': 1000.0/86400, 'CUBIC_FEET_PER_SECOND': 0.028316846592,
+                  'MEGAGALLONS_PER_DAY': 3785.411784/86400, 'GALLONS_PER_MINUTE': 0.003785411784/60}
+SPEED_FACTORS  = {'METERS_PER_SECOND': 1.0, 'CENTIMETERS_PER_SECOND': 0.01, 'FEET_PER_SECOND': 0.3048,
+                  'KNOTS': 1852.0/3600, 'MILES_PER_HOUR': 0.44704, 'KILOMETERS_PER_HOUR': 1.0/3.6}
+
+# length unit names by output header units label
+LENGTH_LABELS = {'m': 'METERS', 'cm': 'CENTIMETERS', 'mm': 'MILLIMETERS', 'km': 'KILOMETERS', 'ft': 'FEET',
+                 'in': 'INCHES', 'yd': 'YARDS', 'mi': 'MILES'}
+
+
+def unit_name(unit):
+    return getattr(unit, 'name', str(unit))
+
+
+# value in SI units, for a unit of the parameter stores and the factors of its kind
+def to_si(value, unit, factors):
+    name = unit_name(unit)
+    if name not in factors:
+        raise ValueError(f"Unsupported units: {name}")
+    return value*factors[name]
+
+
+def to_celsius(value, unit):
+    name = unit_name(unit)
+    if name == 'CELSIUS':
+        return value
+    if name == 'FAHRENHEIT':
+        return (value - 32.0)*5.0/9.0
+    if name == 'KELVIN':
+        return value - 273.15
+    raise ValueError(f"Unsupported units: {name}")
+
+
+def to_psu(value, unit):
+    name = unit_name(unit)
+    if name != 'PRACTICAL_SALINITY_UNITS':
+        raise ValueError(f"Unsupported units: {name}")
+    return value
+
+
+# metres per unit of a length output header
+def header_meters(hdr):
+    if hdr['units_label'] not in LENGTH_LABELS:
+        raise ValueError(f"Unknown length units for {hdr['label']}: {hdr['units_label']}")
+    return LENGTH_FACTORS[LENGTH_LABELS[hdr['units_label']]]